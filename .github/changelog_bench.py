@@ -0,0 +1,715 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the changelog generator.
+
+Generates synthetic registry data (configurable numbers of packages,
+image variants, release tags and commits) and runs the stages of the
+generator (``changelog_core.py``) against it, timing each one. External
+tools are replaced by stub ``skopeo``, ``gh`` and ``git`` executables
+with a configurable latency; with ``--backend native`` manifests are served by an
+in-process OCI registry stand-in instead. Results are appended to a JSON
+history file and compared with earlier runs of the same scenario so that
+regressions show up.
+
+The stubs are this very script re-invoked with ``--stub <tool>``; they
+read the scenario from ``BENCH_*`` environment variables.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger("changelog_bench")
+
+NAMESPACE = "bench"
+TARGET = "lts"
+NEWEST_DATE = datetime(2025, 9, 30, tzinfo=timezone.utc)
+BUILDS_PER_DAY = 3
+
+
+@dataclass
+class Scenario:
+    """Size of the synthetic data set."""
+    packages: int = 5000
+    variants: int = 3
+    tags: int = 20000
+    commits: int = 2000
+    latency: float = 0.0
+
+    @classmethod
+    def from_env(cls) -> "Scenario":
+        return cls(
+            packages=int(os.environ["BENCH_PACKAGES"]),
+            variants=int(os.environ["BENCH_VARIANTS"]),
+            tags=int(os.environ["BENCH_TAGS"]),
+            commits=int(os.environ["BENCH_COMMITS"]),
+            latency=float(os.environ["BENCH_LATENCY"]),
+        )
+
+    def to_env(self) -> Dict[str, str]:
+        return {f"BENCH_{key.upper()}": str(value) for key, value in asdict(self).items()}
+
+    def key(self) -> str:
+        return f"p{self.packages}-v{self.variants}-t{self.tags}-c{self.commits}-l{self.latency}"
+
+
+# Synthetic data
+
+def variant_suffixes(count: int) -> List[str]:
+    """Image variant suffixes: the real three first, then numbered extras."""
+    known = ["", "-dx", "-gdx"]
+    return (known + [f"-v{i}" for i in range(len(known), count)])[:count]
+
+
+def repositories(scenario: Scenario) -> List[str]:
+    return [f"bluefin{suffix}" for suffix in variant_suffixes(scenario.variants)]
+
+
+def release_tag(position: int) -> str:
+    """Tag of the ``position``-th newest release (0 is the latest)."""
+    day, build = divmod(position, BUILDS_PER_DAY)
+    date = (NEWEST_DATE - timedelta(days=day)).strftime("%Y%m%d")
+    # Same-day rebuilds count down from the newest build number
+    build = BUILDS_PER_DAY - build
+    return f"{TARGET}.{date}" if build == 1 else f"{TARGET}.{date}.{build}"
+
+
+def release_position(tag: str) -> Optional[int]:
+    """Inverse of ``release_tag``; the moving tag maps to the latest release."""
+    tag = tag[:-len("-hwe")] if tag.endswith("-hwe") else tag
+    if tag == TARGET:
+        return 0
+    parts = tag.split(".")
+    if len(parts) not in (2, 3) or parts[0] != TARGET:
+        return None
+    try:
+        date = datetime.strptime(parts[1], "%Y%m%d").replace(tzinfo=timezone.utc)
+        build = int(parts[2]) if len(parts) == 3 else 1
+    except ValueError:
+        return None
+    day = (NEWEST_DATE - date).days
+    if day < 0 or not 1 <= build <= BUILDS_PER_DAY:
+        return None
+    return day * BUILDS_PER_DAY + (BUILDS_PER_DAY - build)
+
+
+def repo_tags(scenario: Scenario, repo: str) -> List[str]:
+    """Every tag of a repository: releases, moving tags and, in the base image, HWE twins."""
+    tags = [TARGET, "latest"]
+    for position in range(scenario.tags):
+        tag = release_tag(position)
+        tags.append(tag)
+        if repo == "bluefin":
+            tags.append(f"{tag}-hwe")
+    return tags
+
+
+def commit_hash(index: int) -> str:
+    return hashlib.sha1(f"commit-{index}".encode()).hexdigest()
+
+
+def commit_time(index: int) -> int:
+    return int(NEWEST_DATE.timestamp()) - index * 1800
+
+
+def commit_subject(index: int) -> str:
+    kinds = ["feat: synthetic change", "fix: synthetic fix", "chore(deps): update thing",
+             "chore: housekeeping", "Merge pull request"]
+    return f"{kinds[index % len(kinds)]} {index}"
+
+
+def image_document(scenario: Scenario, repo: str, tag: str) -> Optional[Dict[str, Any]]:
+    """A ``skopeo inspect --no-tags`` document for one synthetic image."""
+    position = release_position(tag)
+    if position is None or position >= scenario.tags or repo not in repositories(scenario):
+        return None
+    if tag.endswith("-hwe") and repo != "bluefin":
+        return None
+
+    # Package i gets a new release every (i % 17 + 1) builds
+    packages = {
+        f"pkg{i}": f"1.{i}-{(scenario.tags - position) // (i % 17 + 1)}.el10"
+        for i in range(scenario.packages)
+    }
+    packages["kernel"] = f"6.12.0-{(scenario.tags - position) // 9}.el10"
+    if tag.endswith("-hwe"):
+        packages["kernel"] = f"6.16.{(scenario.tags - position) // 5}-200.fc42"
+    if repo != "bluefin":
+        packages[f"{repo}-only"] = f"{(scenario.tags - position) // 4}.0"
+
+    revision = commit_hash(min(position * 2, scenario.commits - 1))
+    created = datetime.fromtimestamp(commit_time(min(position * 2, scenario.commits - 1)) + 600,
+                                     tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    digest = hashlib.sha256(f"{repo}:{release_tag(position)}:{tag.endswith('-hwe')}".encode()).hexdigest()
+    return {
+        "Name": f"bench.invalid/{NAMESPACE}/{repo}",
+        "Digest": f"sha256:{digest}",
+        "RepoTags": [],
+        "Created": created,
+        "Architecture": "amd64",
+        "Os": "linux",
+        "Labels": {
+            "dev.hhd.rechunk.info": json.dumps({"packages": packages}),
+            "org.opencontainers.image.revision": revision,
+            "org.opencontainers.image.created": created,
+            "ostree.linux": "6.12.0-55.el10.x86_64",
+        },
+        "Layers": [f"sha256:{'0' * 63}{i % 10}" for i in range(60)],
+        "Env": ["PATH=/usr/bin"],
+    }
+
+
+# Stub executables
+
+def stub_skopeo(scenario: Scenario, args: List[str]) -> int:
+    """``skopeo inspect [--no-tags] docker://...:tag`` and ``skopeo list-tags docker://...``."""
+    reference = args[-1].split("/")[-1]
+    if args[0] == "list-tags":
+        print(json.dumps({"Repository": reference, "Tags": repo_tags(scenario, reference)}))
+        return 0
+    repo, _, tag = reference.partition(":")
+    document = image_document(scenario, repo, tag)
+    if document is None:
+        print("manifest unknown", file=sys.stderr)
+        return 1
+    print(json.dumps(document))
+    return 0
+
+
+def stub_gh(scenario: Scenario, args: List[str]) -> int:
+    """``gh api .../releases`` and ``gh release view``: every release but the latest is published."""
+    if args[:1] == ["api"]:
+        if "/releases" not in args[1]:
+            print("[]")
+            return 0
+        # Already in the shape the generator's --jq filter produces
+        limit = int(parse_qs(urlsplit(args[1]).query).get("per_page", ["30"])[0])
+        print(json.dumps([
+            {"tag": release_tag(position), "draft": False,
+             "published": datetime.fromtimestamp(commit_time(position * 2), tz=timezone.utc).isoformat()}
+            for position in range(1, min(scenario.tags, limit + 1))
+        ]))
+        return 0
+    if args[:2] == ["release", "view"]:
+        position = release_position(args[2])
+        return 0 if position is not None and 1 <= position < scenario.tags else 1
+    return 1
+
+
+def stub_git(scenario: Scenario, args: List[str]) -> int:
+    """Enough of ``git`` for the commit index and ``git log`` paths."""
+    if args[:1] == ["-C"]:
+        args = args[2:]
+    if args == ["rev-parse", "--absolute-git-dir"]:
+        git_dir = Path(os.environ["BENCH_GIT_DIR"])
+        git_dir.mkdir(parents=True, exist_ok=True)
+        print(git_dir)
+        return 0
+    if args == ["rev-parse", "HEAD"]:
+        print(commit_hash(0))
+        return 0
+    if args[:2] == ["merge-base", "--is-ancestor"]:
+        return 0
+    if args[:1] != ["log"]:
+        print(f"stub git: unsupported command {args}", file=sys.stderr)
+        return 1
+
+    positions = {commit_hash(i): i for i in range(scenario.commits)}
+    first, last = 0, scenario.commits
+    since, until = float("-inf"), float("inf")
+    for arg in args[1:]:
+        if arg.startswith("--since="):
+            since = datetime.strptime(arg[8:], "%Y-%m-%d %H:%M").timestamp()
+        elif arg.startswith("--until="):
+            until = datetime.strptime(arg[8:], "%Y-%m-%d %H:%M").timestamp()
+        elif not arg.startswith("-"):
+            start, _, finish = arg.rpartition("..")
+            if finish not in positions or (start and start not in positions):
+                print(f"fatal: bad revision '{arg}'", file=sys.stderr)
+                return 128
+            first = positions[finish]
+            last = positions[start] if start else scenario.commits
+
+    out = sys.stdout.buffer
+    for i in range(first, last):
+        if not since <= commit_time(i) <= until:
+            continue
+        parents = commit_hash(i + 1) if i + 1 < scenario.commits else ""
+        out.write(f"{commit_hash(i)}\x1f{commit_hash(i)[:7]}\x1f{commit_time(i)}\x1f"
+                  f"{parents}\x1f{commit_subject(i)}\0".encode())
+    return 0
+
+
+STUBS = {"skopeo": stub_skopeo, "gh": stub_gh, "git": stub_git}
+
+
+def install_stubs(directory: Path) -> None:
+    """Write ``skopeo``, ``gh`` and ``git`` wrappers that call back into this script."""
+    for tool in STUBS:
+        path = directory / tool
+        path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{Path(__file__).resolve()}" '
+                        f'--stub {tool} "$@"\n')
+        path.chmod(0o755)
+
+
+# Registry stand-in
+
+class RegistryStandIn:
+    """In-process OCI distribution API serving the synthetic images.
+
+    Implements what the native client needs: anonymous bearer tokens,
+    multi-arch indexes, manifests by tag or digest, config blobs behind a
+    redirect, and paginated tag listing. The newest ``hidden`` releases are
+    not served until ``publish`` releases them one by one, moving the
+    ``lts`` tag along, which is what ``--watch`` waits for.
+    """
+
+    def __init__(self, scenario: Scenario, hidden: int = 0):
+        self.scenario = scenario
+        self.hidden = hidden
+        self.blobs: Dict[str, Tuple[str, bytes]] = {}
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/{NAMESPACE}"
+
+    def __enter__(self) -> "RegistryStandIn":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _store(self, media_type: str, body: bytes) -> str:
+        digest = f"sha256:{hashlib.sha256(body).hexdigest()}"
+        with self._lock:
+            self.blobs[digest] = (media_type, body)
+        return digest
+
+    def publish(self) -> str:
+        """Release the next hidden build and return its tag."""
+        with self._lock:
+            self.hidden -= 1
+            return release_tag(self.hidden)
+
+    def served_tag(self, tag: str) -> Optional[str]:
+        """The release a tag stands for right now, or None if it is not published yet."""
+        if tag == TARGET:
+            return release_tag(self.hidden)
+        position = release_position(tag)
+        return None if position is not None and position < self.hidden else tag
+
+    def image_index(self, repo: str, tag: str) -> Optional[Tuple[str, bytes]]:
+        """Build (and remember) the index, manifest and config blobs of an image."""
+        tag = self.served_tag(tag)
+        if tag is None:
+            return None
+        document = image_document(self.scenario, repo, tag)
+        if document is None:
+            return None
+        config = json.dumps({
+            "created": document["Created"], "architecture": "amd64", "os": "linux",
+            "config": {"Labels": document["Labels"], "Env": document["Env"]},
+        }).encode()
+        config_digest = self._store("application/vnd.oci.image.config.v1+json", config)
+        manifest = json.dumps({
+            "schemaVersion": 2,
+            "mediaType": "application/vnd.oci.image.manifest.v1+json",
+            "config": {"mediaType": "application/vnd.oci.image.config.v1+json",
+                       "digest": config_digest, "size": len(config)},
+            "layers": [{"mediaType": "application/vnd.oci.image.layer.v1.tar+gzip",
+                        "digest": layer, "size": 1} for layer in document["Layers"]],
+        }).encode()
+        manifest_digest = self._store("application/vnd.oci.image.manifest.v1+json", manifest)
+        index = json.dumps({
+            "schemaVersion": 2,
+            "mediaType": "application/vnd.oci.image.index.v1+json",
+            "manifests": [{"mediaType": "application/vnd.oci.image.manifest.v1+json",
+                           "digest": manifest_digest, "size": len(manifest),
+                           "platform": {"os": "linux", "architecture": "amd64"}}],
+        }).encode()
+        self._store("application/vnd.oci.image.index.v1+json", index)
+        return "application/vnd.oci.image.index.v1+json", index
+
+    def _handler(self) -> type:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def setup(self) -> None:
+                with stand_in._lock:
+                    stand_in.connections += 1
+                super().setup()
+
+            def _send(self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None) -> None:
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def do_HEAD(self) -> None:
+                self.do_GET()
+
+            def do_GET(self) -> None:
+                with stand_in._lock:
+                    stand_in.requests += 1
+                if stand_in.scenario.latency:
+                    time.sleep(stand_in.scenario.latency)
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+
+                if url.path == "/token":
+                    return self._send(200, json.dumps({"token": query["scope"][0]}).encode())
+                if url.path.startswith("/storage/"):
+                    media_type, body = stand_in.blobs[url.path[len("/storage/"):]]
+                    return self._send(200, body, {"Content-Type": media_type})
+
+                prefix = f"/v2/{NAMESPACE}/"
+                repo, _, rest = url.path[len(prefix):].partition("/")
+                kind, _, reference = rest.partition("/")
+                scope = f"repository:{NAMESPACE}/{repo}:pull"
+                if not url.path.startswith(prefix) or not kind:
+                    return self._send(404)
+                if self.headers.get("Authorization") != f"Bearer {scope}":
+                    challenge = f'Bearer realm="http://{self.headers["Host"]}/token",service="bench",scope="{scope}"'
+                    return self._send(401, headers={"WWW-Authenticate": challenge})
+
+                if kind == "manifests":
+                    found = stand_in.blobs.get(reference) or stand_in.image_index(repo, reference)
+                    if found is None:
+                        return self._send(404, b'{"errors":[{"code":"MANIFEST_UNKNOWN"}]}')
+                    media_type, body = found
+                    return self._send(200, body, {
+                        "Content-Type": media_type,
+                        "Docker-Content-Digest": f"sha256:{hashlib.sha256(body).hexdigest()}",
+                    })
+                if kind == "blobs":
+                    return self._send(307, headers={"Location": f"/storage/{reference}"})
+                if kind == "tags":
+                    tags = sorted(tag for tag in repo_tags(stand_in.scenario, repo)
+                                  if stand_in.served_tag(tag.removesuffix("-hwe")))
+                    size = int(query.get("n", ["100"])[0])
+                    last = query.get("last", [None])[0]
+                    if last:
+                        tags = [tag for tag in tags if tag > last]
+                    page = tags[:size]
+                    headers = {}
+                    if len(tags) > size:
+                        headers["Link"] = f'<{prefix}{repo}/tags/list?n={size}&last={page[-1]}>; rel="next"'
+                    return self._send(200, json.dumps({"name": f"{NAMESPACE}/{repo}", "tags": page}).encode(),
+                                      headers)
+                return self._send(404)
+
+        return Handler
+
+
+# Benchmark driver
+
+def time_stage(repeat: int, setup: Callable[[], Any], stage: Callable[[Any], Any]) -> List[float]:
+    """Time ``stage(setup())`` ``repeat`` times, excluding the setup."""
+    samples = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        stage(state)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_benchmarks(changelogs: Any, scenario: Scenario, backend: str, repeat: int,
+                   workdir: Path) -> Dict[str, Dict[str, float]]:
+    """Run every stage against the synthetic data and return timing statistics."""
+    base_config = changelogs.load_config(str(Path(__file__).with_name("changelog_config.yaml")))
+
+    def new_generator(registry_url: str) -> Any:
+        defaults = replace(base_config.defaults, cache_enabled=False, fetch_backend=backend,
+                           retries=1, retry_wait=0.0, deadline_seconds=0.0, rate_limit=0.0,
+                           circuit_breaker_failures=0, enable_commits=True)
+        config = replace(base_config, registry_url=registry_url, defaults=defaults,
+                         image_variants=tuple(variant_suffixes(scenario.variants)))
+        return changelogs.ChangelogGenerator(config, use_cache=False)
+
+    with RegistryStandIn(scenario) as registry:
+        registry_url = registry.url if backend == "native" else f"bench.invalid/{NAMESPACE}"
+        warm = new_generator(registry_url)
+        manifests = warm.get_manifests(TARGET)
+        prev, curr = warm.get_tags(TARGET, manifests)
+        if (prev, curr) != (release_tag(1), release_tag(0)):
+            raise RuntimeError(f"Resolved {prev} -> {curr} instead of {release_tag(1)} -> {release_tag(0)}")
+        prev_manifests = warm.get_manifests(prev)
+        versions = warm.get_versions(manifests)
+        prev_versions = warm.get_versions(prev_manifests)
+        common, others = warm.get_package_groups(TARGET, prev_manifests, manifests)
+        hwe = warm.get_hwe_kernel_change(prev, curr, TARGET)
+
+        def fresh() -> Any:
+            return new_generator(registry_url)
+
+        def with_manifests() -> Any:
+            generator = fresh()
+            generator.preload_manifests({TARGET: manifests, prev: prev_manifests})
+            return generator
+
+        def with_commit_index() -> Any:
+            # Index built, but not yet loaded by this generator
+            generator = with_manifests()
+            generator.get_commits(prev_manifests, manifests, TARGET, str(workdir))
+            return with_manifests()
+
+        def cold_commit_index() -> Any:
+            shutil.rmtree(os.environ["BENCH_GIT_DIR"], ignore_errors=True)
+            return with_manifests()
+
+        def cold_start() -> Any:
+            # Neither the commit index nor the release manifests are there yet
+            shutil.rmtree(os.environ["BENCH_GIT_DIR"], ignore_errors=True)
+            return fresh()
+
+        def commits_and_fetches(generator: Any) -> None:
+            """Collect commits and fetch both releases as concurrent pipeline stages.
+
+            Fails unless some registry fetch ran while git was reading the
+            history, which is what running them as separate stages is for.
+            """
+            trace, changelogs.tracer = changelogs.tracer, changelogs.Tracer()
+            try:
+                changelogs.tracer.enable()
+                pipeline = changelogs.Pipeline()
+                pipeline.add("commits", lambda: generator.collect_commits(
+                    prev_manifests, manifests, TARGET, str(workdir)))
+                pipeline.add("manifests", lambda: generator.prefetch_manifests([curr, prev]))
+                _, errors = pipeline.run()
+                events = list(changelogs.tracer._events)
+            finally:
+                changelogs.tracer = trace
+            if errors:
+                raise next(iter(errors.values()))
+            git = [(e["ts"], e["ts"] + e["dur"]) for e in events if e["cat"] == "git"]
+            fetches = [(e["ts"], e["ts"] + e["dur"]) for e in events if e["cat"] in ("skopeo", "registry")]
+            if not any(start < git_end and git_start < end
+                       for start, end in fetches for git_start, git_end in git):
+                raise RuntimeError("Registry fetches waited for git instead of running alongside it")
+
+        stages: Dict[str, Tuple[Callable[[], Any], Callable[[Any], Any]]] = {
+            "get_manifests": (fresh, lambda g: g.get_manifests(TARGET)),
+            "get_tags": (with_manifests, lambda g: g.get_tags(TARGET, manifests)),
+            "get_versions": (with_manifests, lambda g: (g.get_versions(manifests), g.get_versions(prev_manifests))),
+            "get_package_groups": (with_manifests, lambda g: g.get_package_groups(TARGET, prev_manifests, manifests)),
+            "calculate_changes": (with_manifests, lambda g: [
+                g.calculate_changes(pkgs, prev_versions, versions) for pkgs in [common, *others.values()]
+            ]),
+            "template": (with_manifests, lambda g: g.changelog_template.render(dict(
+                g._pkgrel_values(g.changelog_template.packages, *hwe, versions, prev_versions),
+                handwritten="", target=TARGET, prev=prev, curr=curr,
+            ), [])),
+            "commits_cold": (cold_commit_index, lambda g: g.get_commits(prev_manifests, manifests, TARGET, str(workdir))),
+            "commits_warm": (with_commit_index, lambda g: g.get_commits(prev_manifests, manifests, TARGET, str(workdir))),
+            "commits_and_fetches": (cold_start, commits_and_fetches),
+            "render_changelog": (with_manifests, lambda g: g.render_changelog(
+                None, TARGET, None, str(workdir), prev_manifests, manifests)),
+            "github_releases": (lambda: changelogs.GitHubReleases(timeout=30),
+                                lambda r: (r.exists(curr), r.latest())),
+        }
+
+        if backend == "native":
+            watch_args = changelogs.setup_argument_parser().parse_args(
+                [TARGET, "--watch", "--dry-run", "--workdir", str(workdir)])
+
+            def poll(watcher: Any) -> List[str]:
+                # Dry runs print the title of every changelog generated
+                with contextlib.redirect_stdout(io.StringIO()):
+                    return watcher.poll()
+
+            def watching() -> Any:
+                # The first poll generates the changelog of the release before the latest
+                registry.hidden = 1
+                watcher = changelogs.TagWatcher(fresh(), [TARGET], watch_args, None)
+                poll(watcher)
+                return watcher
+
+            def published() -> Any:
+                watcher = watching()
+                registry.publish()
+                return watcher
+
+            def poll_new_tag(watcher: Any) -> None:
+                if poll(watcher) != [TARGET]:
+                    raise RuntimeError("--watch did not pick up the new release")
+
+            stages["watch_idle"] = (watching, poll)
+            stages["watch_new_tag"] = (published, poll_new_tag)
+
+        results = {}
+        for name, (setup, stage) in stages.items():
+            samples = time_stage(repeat, setup, stage)
+            results[name] = {"min": min(samples), "median": statistics.median(samples)}
+            logger.info(f"{name:<20} min {results[name]['min'] * 1000:9.1f} ms   "
+                        f"median {results[name]['median'] * 1000:9.1f} ms")
+        if backend == "native":
+            logger.info(f"Registry stand-in served {registry.requests} requests "
+                        f"over {registry.connections} connections")
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "-C", str(Path(__file__).parent), "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def compare_with_history(history: List[Dict[str, Any]], key: str, results: Dict[str, Dict[str, float]],
+                         threshold: float, min_delta: float = 0.002, window: int = 5) -> List[str]:
+    """Stages whose median is more than ``threshold`` slower than recent runs.
+    
+    A slowdown also has to exceed ``min_delta`` seconds, so that stages
+    taking a few milliseconds are not flagged on timing noise alone.
+    """
+    previous = [run for run in history if run["scenario"] == key][-window:]
+    regressions = []
+    for stage, stats in results.items():
+        baseline = [run["results"][stage]["median"] for run in previous if stage in run["results"]]
+        if not baseline:
+            continue
+        reference = statistics.median(baseline)
+        delta = stats["median"] - reference
+        change = delta / reference if reference else 0.0
+        marker = ""
+        if change > threshold and delta > min_delta:
+            marker = "  <-- REGRESSION"
+            regressions.append(stage)
+        logger.info(f"{stage:<20} {change * 100:+7.1f}% vs median of last {len(baseline)} runs{marker}")
+    return regressions
+
+
+def setup_argument_parser() -> argparse.ArgumentParser:
+    """Set up the command line argument parser."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the changelog generator against synthetic data",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Default scenario: 5k packages x 3 variants x 20k tags
+  %(prog)s
+
+  # Smaller data set with 50 ms of latency per external call
+  %(prog)s --packages 1000 --tags 500 --latency 0.05
+
+  # Use the in-process registry stand-in and fail on regressions
+  %(prog)s --backend native --fail-on-regression
+        """
+    )
+    parser.add_argument("--packages", type=int, default=5000, help="Packages per image (default: %(default)s)")
+    parser.add_argument("--variants", type=int, default=3, help="Image variants (default: %(default)s)")
+    parser.add_argument("--tags", type=int, default=20000, help="Release tags per repository (default: %(default)s)")
+    parser.add_argument("--commits", type=int, default=2000, help="Commits in the git history (default: %(default)s)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                       help="Seconds of latency added to every stub call and registry request")
+    parser.add_argument("--backend", choices=["skopeo", "native"], default="skopeo",
+                       help="Fetch through the skopeo stub or the registry stand-in (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="Samples per stage (default: %(default)s)")
+    parser.add_argument("--history",
+                       help="JSON file the results are appended to "
+                            "(default: bench-history.json in the generator's cache directory)")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                       help="Relative slowdown reported as a regression (default: %(default)s)")
+    parser.add_argument("--min-delta", type=float, default=0.002,
+                       help="Seconds a stage must slow down by to count as a regression (default: %(default)s)")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                       help="Exit with status 1 when a regression is detected")
+    parser.add_argument("--stub", choices=sorted(STUBS), help=argparse.SUPPRESS)
+    return parser
+
+
+def main() -> None:
+    """Main entry point for the benchmark suite."""
+    # Stub mode: this process stands in for skopeo, gh or git
+    if len(sys.argv) > 2 and sys.argv[1] == "--stub":
+        scenario = Scenario.from_env()
+        if scenario.latency:
+            time.sleep(scenario.latency)
+        sys.exit(STUBS[sys.argv[2]](scenario, sys.argv[3:]))
+
+    args = setup_argument_parser().parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    scenario = Scenario(args.packages, args.variants, args.tags, args.commits, args.latency)
+
+    sys.path.insert(0, str(Path(__file__).parent))
+    import changelog_core
+    # Keep the generator's own progress logging out of the report
+    logging.getLogger("changelog_core").setLevel(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory(prefix="changelog-bench-") as tmp:
+        stub_dir = Path(tmp) / "bin"
+        stub_dir.mkdir()
+        install_stubs(stub_dir)
+        workdir = Path(tmp) / "work"
+        workdir.mkdir()
+        os.environ.update(scenario.to_env())
+        os.environ["BENCH_GIT_DIR"] = str(Path(tmp) / "git")
+        os.environ["PATH"] = f"{stub_dir}{os.pathsep}{os.environ['PATH']}"
+
+        logger.info(f"Scenario {scenario.key()} ({args.backend} backend, {args.repeat} samples per stage)")
+        results = run_benchmarks(changelog_core, scenario, args.backend, args.repeat, workdir)
+
+    if args.history:
+        history_path = Path(args.history)
+    else:
+        config = changelog_core.load_config(str(Path(__file__).with_name("changelog_config.yaml")))
+        history_path = changelog_core._cache_root(config.defaults) / "bench-history.json"
+        history_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        history = json.loads(history_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        history = []
+    key = f"{scenario.key()}-{args.backend}"
+    regressions = compare_with_history(history, key, results, args.threshold, args.min_delta)
+
+    history.append({
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "scenario": key,
+        "results": results,
+    })
+    history_path.write_text(json.dumps(history, indent=2), encoding="utf-8")
+    logger.info(f"Results appended to {history_path}")
+
+    if regressions and args.fail_on_regression:
+        logger.error(f"Regressions detected in: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
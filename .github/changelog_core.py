@@ -0,0 +1,4253 @@
+"""
+Changelog generation for Bluefin LTS container images.
+
+Generates changelogs by comparing container image manifests and
+extracting package differences between versions. This is the
+implementation behind the ``changelogs.py`` entry point.
+
+Modules only some code paths need (yaml, http.client, gzip, argparse,
+multiprocessing, sqlite3) are imported where they are used to keep startup short.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field, fields, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Pattern, Set, Tuple
+from urllib.parse import urlencode, urljoin, urlsplit
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+# Placeholders each row template may use (None: any, rendered leniently)
+TEMPLATE_FIELDS: Dict[str, Optional[Set[str]]] = {
+    "pattern_add": {"name", "version"},
+    "pattern_change": {"name", "prev", "new"},
+    "pattern_remove": {"name", "version"},
+    "pattern_pkgrel_changed": {"prev", "new"},
+    "pattern_pkgrel": {"version"},
+    "commit_format": {"short", "subject", "githash"},
+    "handwritten_placeholder": {"curr"},
+    "changelog_title": None,
+}
+
+# Section templates and the placeholder their rows are spliced into
+SECTION_TEMPLATES = {
+    "common_pattern": ("changes", {"title"}),
+    "commits_format": ("commits", set()),
+}
+
+
+def _check_format(where: str, source: Any, allowed: Optional[Set[str]]) -> str:
+    """Validate a ``str.format`` template, returning it unchanged."""
+    import string
+    if not isinstance(source, str):
+        raise ConfigError(f"{where}: expected a string, got {source!r}")
+    try:
+        names = {re.split(r"[.\[]", name, 1)[0]
+                 for _, name, _, _ in string.Formatter().parse(source) if name is not None}
+    except ValueError as e:
+        raise ConfigError(f"{where}: malformed template: {e}") from e
+    if allowed is not None:
+        unknown = names - allowed
+        if unknown:
+            raise ConfigError(f"{where}: unknown placeholder {{{sorted(unknown)[0]}}}, "
+                              f"expected one of {', '.join(sorted(allowed)) or 'none'}")
+    return source
+
+
+@dataclass(frozen=True, slots=True)
+class SectionTemplate:
+    """A table template pre-split around the placeholder its rows go into."""
+    head: str
+    tail: str
+    
+    @classmethod
+    def compile(cls, where: str, source: Any, placeholder: str, allowed: Set[str]) -> SectionTemplate:
+        _check_format(where, source, allowed | {placeholder})
+        head, found, tail = source.partition("{" + placeholder + "}")
+        if not found:
+            raise ConfigError(f"{where}: missing the {{{placeholder}}} placeholder")
+        return cls(head, tail)
+    
+    def wrap(self, rows: List[str], **fields: str) -> List[str]:
+        """Put the rows between head and tail; no rows render as no section at all."""
+        if not rows:
+            return []
+        return [self.head.format(**fields), *rows, self.tail.format(**fields)]
+
+
+@dataclass(frozen=True, slots=True)
+class Templates:
+    """Output templates, checked for unknown placeholders at load time."""
+    pattern_add: str
+    pattern_change: str
+    pattern_remove: str
+    pattern_pkgrel_changed: str
+    pattern_pkgrel: str
+    commit_format: str
+    handwritten_placeholder: str
+    changelog_title: str
+    common_pattern: SectionTemplate
+    commits_format: SectionTemplate
+    changelog_format: ChangelogTemplate
+    
+    @classmethod
+    def compile(cls, data: Dict[str, Any],
+                changelog_nodes: Optional[List[Tuple[bool, str]]] = None) -> Templates:
+        values: Dict[str, Any] = {
+            name: _check_format(f"templates.{name}", _config_get(data, name, "templates"), allowed)
+            for name, allowed in TEMPLATE_FIELDS.items()
+        }
+        for name, (placeholder, allowed) in SECTION_TEMPLATES.items():
+            values[name] = SectionTemplate.compile(
+                f"templates.{name}", _config_get(data, name, "templates"), placeholder, allowed)
+        source = _config_get(data, "changelog_format", "templates")
+        if not isinstance(source, str):
+            raise ConfigError(f"templates.changelog_format: expected a string, got {source!r}")
+        values["changelog_format"] = (ChangelogTemplate.from_nodes(changelog_nodes) if changelog_nodes
+                                      else ChangelogTemplate(source))
+        return cls(**values)
+
+
+@dataclass(frozen=True, slots=True)
+class Patterns:
+    """Compiled regular expressions; ``start`` holds one release tag pattern per target."""
+    centos: Pattern[str]
+    start: Dict[str, Pattern[str]]
+    
+    @classmethod
+    def compile(cls, data: Dict[str, Any], targets: Tuple[str, ...]) -> Patterns:
+        def compile_regex(name: str, source: Any) -> Pattern[str]:
+            try:
+                return re.compile(source)
+            except (re.error, TypeError) as e:
+                raise ConfigError(f"patterns.{name}: invalid regular expression {source!r}: {e}") from e
+        
+        start_pattern = _config_get(data, "start_pattern", "patterns")
+        if not isinstance(start_pattern, str) or "{target}" not in start_pattern:
+            raise ConfigError(f"patterns.start_pattern: must contain the {{target}} placeholder, got {start_pattern!r}")
+        try:
+            start = {target: compile_regex("start_pattern", start_pattern.format(target=re.escape(target)))
+                     for target in targets}
+        except (KeyError, IndexError, ValueError) as e:
+            raise ConfigError(f"patterns.start_pattern: braces other than {{target}} must be doubled: {e}") from e
+        return cls(compile_regex("centos", _config_get(data, "centos", "patterns")), start)
+
+
+@dataclass(frozen=True, slots=True)
+class Blacklist:
+    """Packages left out of the changelog: exact names plus glob rules such as ``glibc-*``."""
+    names: frozenset
+    rules: Optional[Pattern[str]] = None
+    
+    @classmethod
+    def compile(cls, entries: Any) -> Blacklist:
+        entries = _config_strings("package_blacklist", entries)
+        globs = [entry for entry in entries if any(c in entry for c in "*?[")]
+        rules = None
+        if globs:
+            import fnmatch
+            rules = re.compile("|".join(fnmatch.translate(entry) for entry in globs))
+        return cls(frozenset(entry for entry in entries if entry not in globs), rules)
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self.names or (self.rules is not None and self.rules.match(name) is not None)
+    
+    def matching(self, packages: Dict[str, str]) -> Iterator[str]:
+        """Yield the names in ``packages`` that are blacklisted."""
+        if self.rules is None:
+            yield from (name for name in self.names if name in packages)
+        else:
+            yield from (name for name in packages if name in self)
+
+
+@dataclass(frozen=True, slots=True)
+class Defaults:
+    """Tunables from the ``defaults`` section; see changelog_config.yaml."""
+    retries: int = 3
+    fetch_concurrency: int = 8
+    fetch_backend: str = "auto"
+    retry_wait: float = 5
+    retry_max_wait: float = 60
+    rate_limit: float = 0
+    rate_burst: int = 1
+    circuit_breaker_failures: int = 0
+    circuit_breaker_cooldown: float = 60
+    deadline_seconds: float = 0
+    timeout_seconds: float = 30
+    output_file: str = "changelog.md"
+    env_output_file: str = "output.env"
+    diff_output_file: str = ""
+    enable_commits: bool = False
+    commit_index: bool = True
+    backfill_workers: int = 0
+    cache_enabled: bool = True
+    cache_dir: str = ""
+    cache_max_bytes: int = 256 * 1024 * 1024
+    cache_tag_ttl: float = 300
+    release_cache_ttl: float = 60
+    watch_interval: float = 300
+    history_db: str = ""
+    
+    BACKENDS = ("skopeo", "native", "auto")
+    
+    @classmethod
+    def compile(cls, data: Any) -> Defaults:
+        if data is None:
+            return cls()
+        if not isinstance(data, dict):
+            raise ConfigError(f"defaults: expected a mapping, got {data!r}")
+        kinds = {f.name: f.type for f in fields(cls)}
+        values = {}
+        for name, value in data.items():
+            kind = kinds.get(name)
+            if kind is None:
+                raise ConfigError(f"defaults.{name}: unknown setting")
+            if kind == "float" and isinstance(value, int) and not isinstance(value, bool):
+                value = float(value)
+            expected = {"int": int, "float": float, "bool": bool, "str": str}[kind]
+            if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+                raise ConfigError(f"defaults.{name}: expected {kind}, got {value!r}")
+            if expected in (int, float) and value < 0:
+                raise ConfigError(f"defaults.{name}: must not be negative, got {value!r}")
+            values[name] = value
+        if values.get("fetch_backend", cls.fetch_backend) not in cls.BACKENDS:
+            raise ConfigError(f"defaults.fetch_backend: expected one of {', '.join(cls.BACKENDS)}, "
+                              f"got {values['fetch_backend']!r}")
+        return cls(**values)
+
+
+def _config_get(data: Any, key: str, where: str) -> Any:
+    """Return a required setting, naming it precisely when it is missing."""
+    if not isinstance(data, dict):
+        raise ConfigError(f"{where}: expected a mapping, got {data!r}")
+    if key not in data:
+        raise ConfigError(f"{where}.{key}: missing required setting" if where else
+                          f"{key}: missing required setting")
+    return data[key]
+
+
+def _config_strings(where: str, value: Any) -> Tuple[str, ...]:
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ConfigError(f"{where}: expected a list of strings, got {value!r}")
+    return tuple(value)
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Validated configuration loaded from YAML file.
+    
+    Built once per configuration by ``load_config``: regexes are compiled,
+    templates checked and pre-split, and the blacklist turned into a set.
+    Instances are immutable and picklable (they are sent to backfill
+    workers); ``sections`` stays a plain dict for that reason.
+    """
+    os_name: str
+    targets: Tuple[str, ...]
+    registry_url: str
+    package_blacklist: Blacklist
+    image_variants: Tuple[str, ...]
+    patterns: Patterns
+    templates: Templates
+    sections: Dict[str, str]
+    defaults: Defaults
+    
+    @classmethod
+    def from_dict(cls, data: Any, changelog_nodes: Optional[List[Tuple[bool, str]]] = None) -> Config:
+        """Validate and compile the parsed YAML document."""
+        if not isinstance(data, dict):
+            raise ConfigError(f"expected a mapping at the top level, got {data!r}")
+        unknown = set(data) - {f.name for f in fields(cls)}
+        if unknown:
+            raise ConfigError(f"{sorted(unknown)[0]}: unknown setting")
+        
+        targets = _config_strings("targets", _config_get(data, "targets", ""))
+        sections = _config_get(data, "sections", "")
+        if not isinstance(sections, dict) or not all(isinstance(v, str) for v in sections.values()):
+            raise ConfigError(f"sections: expected a mapping of strings, got {sections!r}")
+        if "all" not in sections:
+            raise ConfigError("sections.all: missing required setting")
+        for key in ("os_name", "registry_url"):
+            if not isinstance(_config_get(data, key, ""), str):
+                raise ConfigError(f"{key}: expected a string, got {data[key]!r}")
+        
+        return cls(
+            os_name=data["os_name"],
+            targets=targets,
+            registry_url=data["registry_url"],
+            package_blacklist=Blacklist.compile(data.get("package_blacklist", [])),
+            image_variants=_config_strings("image_variants", _config_get(data, "image_variants", "")),
+            patterns=Patterns.compile(_config_get(data, "patterns", ""), targets),
+            templates=Templates.compile(_config_get(data, "templates", ""), changelog_nodes),
+            sections=dict(sections),
+            defaults=Defaults.compile(data.get("defaults")),
+        )
+
+
+# Bump when the cached form of the configuration changes
+CONFIG_CACHE_VERSION = 2
+
+# Configurations loaded by this process, by cache key
+_loaded_configs: Dict[str, Config] = {}
+
+
+def _config_cache_path(key: str) -> Path:
+    """Location of the compiled form of a configuration file."""
+    root = os.path.join(os.getenv("XDG_CACHE_HOME", "~/.cache"), "bluefin-changelog", "config")
+    return Path(root).expanduser() / f"{key}.json"
+
+
+def _compile_config(raw: bytes, key: str, use_cache: bool = True) -> Config:
+    """Build the Config of a configuration file.
+    
+    Served from the compiled config cache when possible; otherwise the YAML
+    is parsed and validated, and written to the cache for next time. Only
+    configurations that passed validation and enable caching are cached.
+    """
+    cache_path = _config_cache_path(key)
+    if use_cache:
+        try:
+            cached = json.loads(cache_path.read_text(encoding="utf-8"))
+            return Config.from_dict(cached["config"], [tuple(node) for node in cached["changelog_template"]])
+        except (OSError, ValueError, KeyError, TypeError, ConfigError):
+            pass
+    
+    import yaml
+    try:
+        data = yaml.safe_load(raw)
+    except yaml.YAMLError as e:
+        logging.error(f"Error parsing YAML configuration: {e}")
+        sys.exit(1)
+    config = Config.from_dict(data)
+    if not use_cache or not config.defaults.cache_enabled:
+        return config
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=cache_path.parent, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"config": data, "changelog_template": config.templates.changelog_format.nodes}, f)
+        os.replace(tmp, cache_path)
+    except (OSError, TypeError, ValueError) as e:
+        logger.debug("Not caching compiled configuration: %s", e)
+    return config
+
+
+def load_config(config_path: str = ".github/changelog_config.yaml", use_cache: bool = True) -> Config:
+    """Load configuration from YAML file.
+    
+    Each configuration is loaded once per process. Unless ``use_cache`` is
+    false or the configuration disables caching, its parsed form and the
+    compiled changelog template are also cached on disk, keyed by the hash
+    of the file, so later runs with an unchanged file skip YAML parsing.
+    """
+    try:
+        raw = Path(config_path).read_bytes()
+        key = hashlib.sha256(b"%d\0" % CONFIG_CACHE_VERSION + raw).hexdigest()
+        config = _loaded_configs.get(key)
+        if config is None:
+            config = _loaded_configs[key] = _compile_config(raw, key, use_cache)
+        return config
+    except FileNotFoundError:
+        logging.error(f"Configuration file not found: {config_path}")
+        sys.exit(1)
+    except ConfigError as e:
+        logging.error(f"Invalid configuration {config_path}: {e}")
+        sys.exit(1)
+    except Exception as e:
+        logging.error(f"Error loading configuration: {e}")
+        sys.exit(1)
+
+
+class ChangelogError(Exception):
+    """Custom exception for changelog generation errors."""
+    pass
+
+
+class ManifestFetchError(ChangelogError):
+    """Exception raised when manifest fetching fails."""
+    pass
+
+
+class TagDiscoveryError(ChangelogError):
+    """Exception raised when tag discovery fails."""
+    pass
+
+class GitHubReleaseError(ChangelogError):
+    """Error related to GitHub release operations."""
+    pass
+
+
+class ConfigError(ChangelogError):
+    """Exception raised for an invalid configuration file."""
+    pass
+
+
+class Tracer:
+    """Per-run timings of pipeline stages and external calls, plus counters.
+    
+    Spans are recorded as complete events of the Chrome trace format, so
+    an exported trace opens in ``chrome://tracing`` or Perfetto; counters
+    accumulate retries, bytes fetched and cache hits/misses. Until
+    ``enable`` is called ``span`` returns a shared no-op context manager
+    and ``count`` returns immediately, so the instrumentation is close to
+    free in normal runs.
+    """
+    
+    _DISABLED = contextlib.nullcontext()
+    
+    def __init__(self):
+        self.enabled = False
+        self._events: List[Dict[str, Any]] = []
+        self._counters: Dict[str, float] = defaultdict(int)
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+    
+    def enable(self) -> None:
+        """Start recording; timestamps are relative to this call."""
+        self._origin = time.perf_counter()
+        self.enabled = True
+    
+    def span(self, name: str, category: str = "stage", **args: Any):
+        """Context manager timing the enclosed block as ``name``."""
+        if not self.enabled:
+            return self._DISABLED
+        return self._span(name, category, args)
+    
+    @contextlib.contextmanager
+    def _span(self, name: str, category: str, args: Dict[str, Any]) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            thread = threading.current_thread()
+            event = {
+                "name": name, "cat": category, "ph": "X",
+                "ts": round((start - self._origin) * 1e6, 1),
+                "dur": round((end - start) * 1e6, 1),
+                "pid": os.getpid(), "tid": thread.ident,
+            }
+            if args:
+                event["args"] = {key: str(value) for key, value in args.items()}
+            with self._lock:
+                self._events.append(event)
+                self._threads.setdefault(thread.ident, thread.name)
+    
+    def count(self, name: str, value: float = 1) -> None:
+        """Add ``value`` to the counter ``name``."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] += value
+    
+    def summary(self) -> Dict[str, Any]:
+        """Total, count and maximum duration per span name, plus the counters."""
+        spans: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            events = list(self._events)
+            counters = dict(self._counters)
+        for event in events:
+            stats = spans.setdefault(event["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["total_ms"] += event["dur"] / 1000
+            stats["max_ms"] = max(stats["max_ms"], event["dur"] / 1000)
+        for stats in spans.values():
+            stats["total_ms"] = round(stats["total_ms"], 1)
+            stats["max_ms"] = round(stats["max_ms"], 1)
+        return {"spans": spans, "counters": counters}
+    
+    def export(self, path: str) -> None:
+        """Write the recorded spans as a Chrome trace JSON file."""
+        with self._lock:
+            events = list(self._events)
+            metadata = [
+                {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                for tid, name in self._threads.items()
+            ]
+        data = {
+            "traceEvents": metadata + events,
+            "displayTimeUnit": "ms",
+            "otherData": {"counters": self.summary()["counters"]},
+        }
+        Path(path).write_text(json.dumps(data), encoding="utf-8")
+
+
+tracer = Tracer()
+
+
+def _cache_root(defaults: Defaults) -> Path:
+    """Directory of the caches shared between runs."""
+    return Path(defaults.cache_dir
+                or os.path.join(os.getenv("XDG_CACHE_HOME", "~/.cache"), "bluefin-changelog")).expanduser()
+
+
+class GitHubReleases:
+    """Release metadata of the repository, from a single ``gh api`` query.
+    
+    The most recent releases (newest first) are listed once and shared by
+    every release check of a run. The list is also kept on disk for
+    ``ttl`` seconds, so that runs in quick succession do not query GitHub
+    again. Only a tag that sorts before every listed release (when the
+    list is full) needs a query of its own.
+    """
+    
+    LIMIT = 100
+    
+    def __init__(self, cache_path: Optional[Path] = None, ttl: float = 0, timeout: float = 30):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.timeout = timeout
+        self._releases: Optional[List[Dict[str, Any]]] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: Config, use_cache: bool = True) -> GitHubReleases:
+        defaults = config.defaults
+        cache_path = None
+        if use_cache and defaults.cache_enabled and defaults.release_cache_ttl:
+            # gh resolves {owner}/{repo} from GH_REPO or the repository it runs in
+            key = hashlib.sha256(f"{os.getcwd()}\0{os.getenv('GH_REPO', '')}".encode("utf-8")).hexdigest()
+            cache_path = _cache_root(defaults) / "github" / f"releases-{key[:16]}.json"
+        return cls(cache_path, defaults.release_cache_ttl, defaults.timeout_seconds)
+    
+    def releases(self) -> Optional[List[Dict[str, Any]]]:
+        """Recent releases (drafts included) as ``tag``/``draft``/``published`` entries, or None if gh failed."""
+        with self._lock:
+            if not self._loaded:
+                self._releases = self._read_cache()
+                if self._releases is None:
+                    self._releases = self._query()
+                    if self._releases is not None:
+                        self._write_cache(self._releases)
+                self._loaded = True
+            return self._releases
+    
+    def refresh(self) -> None:
+        """Forget the loaded list, so the next lookup reads it again (from disk while fresh)."""
+        with self._lock:
+            self._loaded = False
+    
+    def exists(self, tag: str) -> bool:
+        """Check if a GitHub release already exists for the given tag."""
+        releases = self.releases()
+        if releases is None:
+            return False
+        if any(release["tag"] == tag for release in releases):
+            return True
+        if len(releases) < self.LIMIT:
+            return False
+        oldest = min((release["tag"] for release in releases), key=TagIndex.sort_key)
+        if TagIndex.sort_key(tag) > TagIndex.sort_key(oldest):
+            return False
+        return self._view(tag)
+    
+    def latest(self) -> Optional[str]:
+        """Get the tag of the last published GitHub release.
+        
+        Drafts and releases without a publication date are skipped.
+        """
+        for release in self.releases() or []:
+            if not release.get("draft") and release.get("published"):
+                return release["tag"]
+        return None
+    
+    def _query(self) -> Optional[List[Dict[str, Any]]]:
+        try:
+            with tracer.span("gh api releases", "gh"):
+                result = subprocess.run(
+                    ["gh", "api", f"repos/{{owner}}/{{repo}}/releases?per_page={self.LIMIT}",
+                     "--jq", "map({tag: .tag_name, draft: .draft, published: .published_at})"],
+                    capture_output=True,
+                    text=True,
+                    timeout=self.timeout
+                )
+        except (subprocess.TimeoutExpired, FileNotFoundError):
+            logger.warning("GitHub CLI not available or timeout - skipping release lookups")
+            return None
+        if result.returncode != 0:
+            logger.warning(f"Failed to list GitHub releases: {result.stderr.strip()}")
+            return None
+        try:
+            releases = json.loads(result.stdout)
+            if not all(isinstance(release["tag"], str) for release in releases):
+                raise ValueError("release without a tag")
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Unexpected GitHub release list: {e}")
+            return None
+        logger.info(f"Found {len(releases)} recent GitHub releases")
+        return releases
+    
+    def _view(self, tag: str) -> bool:
+        try:
+            with tracer.span("gh release view", "gh", tag=tag):
+                result = subprocess.run(
+                    ["gh", "release", "view", tag],
+                    capture_output=True,
+                    text=True,
+                    timeout=self.timeout
+                )
+            return result.returncode == 0
+        except (subprocess.TimeoutExpired, FileNotFoundError):
+            logger.warning("GitHub CLI not available or timeout - skipping release check")
+            return False
+    
+    def _read_cache(self) -> Optional[List[Dict[str, Any]]]:
+        if not self.cache_path:
+            return None
+        try:
+            cached = json.loads(self.cache_path.read_text(encoding="utf-8"))
+            if time.time() - cached["fetched"] > self.ttl:
+                return None
+            logger.info("Using cached GitHub release list")
+            tracer.count("cache_hits")
+            return cached["releases"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+    
+    def _write_cache(self, releases: List[Dict[str, Any]]) -> None:
+        if not self.cache_path:
+            return
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"fetched": time.time(), "releases": releases}, f)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            logger.debug("Not caching GitHub release list: %s", e)
+
+
+def write_github_output(output_file: str, variables: Dict[str, str]) -> None:
+    """Write variables to GitHub Actions output file."""
+    try:
+        with open(output_file, 'a', encoding='utf-8') as f:
+            for key, value in variables.items():
+                f.write(f"{key}={value}\n")
+        logger.info(f"Written {len(variables)} variables to GitHub output: {output_file}")
+    except Exception as e:
+        logger.error(f"Failed to write GitHub output: {e}")
+
+
+def changed_github_output(output_file: str, variables: Dict[str, str]) -> Dict[str, str]:
+    """Variables the GitHub Actions output file does not already set to the same value."""
+    current = {}
+    with contextlib.suppress(OSError):
+        with open(output_file, encoding='utf-8') as f:
+            for line in f:
+                key, separator, value = line.rstrip("\n").partition("=")
+                if separator:
+                    current[key] = value
+    return {key: value for key, value in variables.items() if current.get(key) != value}
+
+
+def write_chunks(path: Path, chunks: Iterable[str]) -> None:
+    """Write text chunks to a file without joining them in memory first."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(chunks)
+
+
+def write_if_changed(path: Path, chunks: List[str]) -> bool:
+    """Write text chunks unless the file already holds exactly that content.
+    
+    The file is compared by hash, so an unchanged output keeps its
+    modification time. Returns whether the file was written.
+    """
+    content = hashlib.sha256()
+    for chunk in chunks:
+        content.update(chunk.encode("utf-8"))
+    try:
+        with open(path, "rb") as f:
+            unchanged = hashlib.file_digest(f, "sha256").digest() == content.digest()
+    except FileNotFoundError:
+        unchanged = False
+    if unchanged:
+        logger.info(f"{path} unchanged, not rewriting it")
+        return False
+    write_chunks(path, chunks)
+    return True
+
+
+def write_release_diffs(path: Path, records: List[Dict[str, Any]]) -> bool:
+    """Write release diffs as one JSON document, or one record per line for ``.ndjson`` paths.
+    
+    Returns whether the file changed (see ``write_if_changed``).
+    """
+    if path.suffix == ".ndjson":
+        chunks = [json.dumps(record, separators=(",", ":")) + "\n" for record in records]
+    else:
+        chunks = [json.dumps(records[0] if len(records) == 1 else records, indent=2), "\n"]
+    return write_if_changed(path, chunks)
+
+
+def read_release_diffs(path: Path) -> List[Dict[str, Any]]:
+    """Read the records written by ``write_release_diffs``."""
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".ndjson":
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    data = json.loads(text)
+    return data if isinstance(data, list) else [data]
+
+
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_JSON_DECODER = json.JSONDecoder()
+
+
+def iter_json_members(text: str, wanted: Set[str]) -> Iterator[Tuple[str, Any]]:
+    """Yield the ``wanted`` members of a JSON object document, one at a time.
+    
+    Top-level members are decoded one after the other and unwanted values
+    are dropped as soon as they are decoded, so at most one member (not
+    the whole document) is held in memory beyond what the caller keeps.
+    Raises JSONDecodeError on malformed input.
+    """
+    def skip(pos: int) -> int:
+        return _JSON_WHITESPACE.match(text, pos).end()
+    
+    def expect(char: str, pos: int) -> int:
+        if text[pos:pos + 1] != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", text, pos)
+        return skip(pos + 1)
+    
+    pos = expect("{", skip(0))
+    if text[pos:pos + 1] == "}":
+        return
+    while True:
+        if text[pos:pos + 1] != '"':
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, pos)
+        key, pos = json.decoder.scanstring(text, pos + 1)
+        pos = expect(":", skip(pos))
+        value, pos = _JSON_DECODER.raw_decode(text, pos)
+        if key in wanted:
+            yield key, value
+        # Drop the value before decoding the next member
+        del value
+        pos = skip(pos)
+        if text[pos:pos + 1] == "}":
+            return
+        pos = expect(",", pos)
+
+
+class ImageManifest:
+    """The parts of an inspected image the changelog uses.
+    
+    ``skopeo inspect`` documents carry layers, environment and every label;
+    only the digest, creation time, a few labels and the parsed rechunk
+    package table are kept, so the manifests held for a whole run stay
+    small. ``package_error`` explains a missing package table.
+    """
+    
+    __slots__ = ("digest", "created", "labels", "packages", "package_error")
+    
+    PACKAGES_LABEL = "dev.hhd.rechunk.info"
+    LABELS = frozenset({
+        "org.opencontainers.image.revision",
+        "org.opencontainers.image.source",
+        "org.opencontainers.image.created",
+        "ostree.commit",
+        "ostree.linux",
+    })
+    
+    def __init__(self, digest: str, created: str, labels: Dict[str, str],
+                 packages: Optional[Dict[str, str]], package_error: Optional[str] = None):
+        self.digest = digest
+        self.created = created
+        self.labels = labels
+        self.packages = packages
+        self.package_error = package_error
+    
+    @classmethod
+    def parse(cls, data: bytes) -> ImageManifest:
+        """Build a record from ``skopeo inspect`` JSON output."""
+        text = data.decode("utf-8") if isinstance(data, bytes) else data
+        fields = dict(iter_json_members(text, {"Digest", "Created", "Labels"}))
+        labels = fields.get("Labels") or {}
+        if not isinstance(labels, dict):
+            labels = {}
+        
+        packages, error = None, None
+        rechunk_info = labels.get(cls.PACKAGES_LABEL)
+        if not rechunk_info:
+            error = "No rechunk info found"
+        else:
+            try:
+                raw = json.loads(rechunk_info)["packages"]
+                packages = {sys.intern(name): version for name, version in raw.items()}
+            except (KeyError, json.JSONDecodeError, TypeError, AttributeError) as e:
+                error = f"Failed to get packages: {e}"
+        
+        return cls(fields.get("Digest") or "", fields.get("Created") or "",
+                   {key: value for key, value in labels.items() if key in cls.LABELS},
+                   packages, error)
+
+
+def _manifest_digests(manifests: Dict[str, ImageManifest]) -> Dict[str, str]:
+    """Image name -> digest ("" if unknown) of a set of manifests."""
+    return {img: manifest.digest for img, manifest in manifests.items()}
+
+
+class ManifestStore:
+    """Persistent, content-addressed manifest cache shared between runs.
+    
+    Manifests are stored gzip-compressed under ``blobs/`` keyed by their image
+    digest, and ``index.json`` maps image references to digests. References
+    to immutable tags (``lts.20250915``) never expire; moving tags (``lts``)
+    are re-resolved once their index entry is older than ``tag_ttl`` seconds.
+    All index and blob updates happen under an exclusive ``flock`` so that
+    parallel jobs can share one cache directory. When the blobs exceed
+    ``max_bytes`` the least recently used ones are evicted.
+    
+    Results derived from manifests (resolved release tags, release diffs)
+    are stored as blobs too, under a hash of their inputs instead of an
+    image digest, and are evicted along with the manifests.
+    """
+    
+    INDEX_FILE = "index.json"
+    LOCK_FILE = ".lock"
+    
+    def __init__(self, root: str, max_bytes: int, tag_ttl: float):
+        self.root = Path(root).expanduser()
+        self.blob_dir = self.root / "blobs"
+        self.max_bytes = max_bytes
+        self.tag_ttl = tag_ttl
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+    
+    @classmethod
+    def from_config(cls, config: "Config") -> Optional["ManifestStore"]:
+        """Create the store configured in ``defaults``, or None if disabled."""
+        defaults = config.defaults
+        if not defaults.cache_enabled:
+            return None
+        root = _cache_root(defaults)
+        try:
+            return cls(root, defaults.cache_max_bytes, defaults.cache_tag_ttl)
+        except OSError as e:
+            logger.warning(f"Manifest cache disabled, cannot use {root}: {e}")
+            return None
+    
+    @contextlib.contextmanager
+    def _locked(self, exclusive: bool):
+        """Hold the cache-wide file lock for the duration of the block."""
+        with open(self.root / self.LOCK_FILE, "a+") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+    
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return json.loads((self.root / self.INDEX_FILE).read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+    
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp)
+            raise
+    
+    def _blob_path(self, digest: str) -> Path:
+        algorithm, _, hexdigest = digest.partition(":")
+        if not hexdigest or not re.fullmatch(r"[A-Za-z0-9]+", algorithm + hexdigest):
+            raise ValueError(f"Invalid digest: {digest!r}")
+        return self.blob_dir / f"{algorithm}-{hexdigest}.json.gz"
+    
+    def get(self, ref: str, immutable: bool) -> Optional[bytes]:
+        """Return the cached manifest for an image reference, if still valid."""
+        import gzip
+        import zlib
+        try:
+            with self._locked(exclusive=False):
+                entry = self._read_index().get(ref)
+                if not entry:
+                    return None
+                if not immutable and time.time() - entry.get("resolved", 0) > self.tag_ttl:
+                    return None
+                path = self._blob_path(entry["digest"])
+                data = gzip.decompress(path.read_bytes())
+            # Record the access for LRU eviction
+            with contextlib.suppress(OSError):
+                os.utime(path)
+            return data
+        except (OSError, ValueError, KeyError, EOFError, zlib.error) as e:
+            logger.debug("Manifest cache miss for %s: %s", ref, e)
+            return None
+    
+    def get_digest(self, digest: str) -> Optional[bytes]:
+        """Return a cached blob by digest, regardless of which tag stored it."""
+        import gzip
+        import zlib
+        try:
+            path = self._blob_path(digest)
+            with self._locked(exclusive=False):
+                data = gzip.decompress(path.read_bytes())
+            with contextlib.suppress(OSError):
+                os.utime(path)
+            return data
+        except (OSError, ValueError, EOFError, zlib.error):
+            return None
+    
+    def put_blob(self, digest: str, data: bytes) -> None:
+        """Store a blob that is only ever looked up by ``digest`` (see ``get_digest``)."""
+        import gzip
+        try:
+            path = self._blob_path(digest)
+            with self._locked(exclusive=True):
+                self._write_atomic(path, gzip.compress(data, compresslevel=6))
+                self._evict(self._read_index())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to store {digest} in manifest cache: {e}")
+    
+    def put(self, ref: str, digest: str, data: Optional[bytes] = None) -> None:
+        """Point ``ref`` at ``digest``, storing the manifest if ``data`` is given."""
+        import gzip
+        try:
+            path = self._blob_path(digest)
+            with self._locked(exclusive=True):
+                if data is not None:
+                    self._write_atomic(path, gzip.compress(data, compresslevel=6))
+                index = self._read_index()
+                index[ref] = {"digest": digest, "resolved": time.time()}
+                self._write_atomic(self.root / self.INDEX_FILE,
+                                   json.dumps(index, sort_keys=True).encode("utf-8"))
+                self._evict(index)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to store {ref} in manifest cache: {e}")
+    
+    def _evict(self, index: Dict[str, Dict[str, Any]]) -> None:
+        """Drop least recently used blobs until the cache fits ``max_bytes``."""
+        blobs = []
+        total = 0
+        for path in self.blob_dir.glob("*.json.gz"):
+            stat = path.stat()
+            blobs.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+            
+        blobs.sort()
+        evicted = set()
+        for _, size, path in blobs:
+            if total <= self.max_bytes:
+                break
+            path.unlink()
+            evicted.add(path.name)
+            total -= size
+        
+        stale = [ref for ref, entry in index.items()
+                 if self._blob_path(entry["digest"]).name in evicted]
+        for ref in stale:
+            del index[ref]
+        self._write_atomic(self.root / self.INDEX_FILE,
+                           json.dumps(index, sort_keys=True).encode("utf-8"))
+        logger.debug("Evicted %d manifests from cache", len(evicted))
+
+
+class PackageHistory:
+    """SQLite database of the package versions of every release image seen.
+    
+    There is one ``images`` row per (repository, release tag), with its
+    digest. Each image has one ``packages`` row per package, holding the
+    normalized version. Release tags are immutable, so an image is only
+    recorded once. A run adds the images it fetched for the first time in
+    a single transaction. Indexes on package name and tag turn
+    per-package history and per-tag lookups into range scans.
+    """
+    
+    SCHEMA_VERSION = 1
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS images (
+            id INTEGER PRIMARY KEY,
+            repo TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            created TEXT,
+            UNIQUE (repo, tag)
+        );
+        CREATE INDEX IF NOT EXISTS images_by_tag ON images (tag);
+        CREATE TABLE IF NOT EXISTS packages (
+            image INTEGER NOT NULL REFERENCES images (id),
+            package TEXT NOT NULL,
+            version TEXT NOT NULL,
+            PRIMARY KEY (image, package)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS packages_by_name ON packages (package, image);
+    """
+    
+    def __init__(self, path: str, timeout: float = 30):
+        import sqlite3
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._lock = threading.Lock()
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, self.SCHEMA_VERSION):
+            self._conn.close()
+            raise ChangelogError(f"Unsupported package history schema {version} in {path}")
+        # WAL lets queries read while a run records
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if version == 0:
+            self._conn.executescript(self.SCHEMA)
+            self._conn.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+    
+    @classmethod
+    def from_config(cls, config: Config) -> Optional[PackageHistory]:
+        import sqlite3
+        if not config.defaults.history_db:
+            return None
+        path = Path(config.defaults.history_db).expanduser()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            return cls(str(path), config.defaults.timeout_seconds)
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Package history database {path} unavailable: {e}")
+            return None
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+    
+    def record(self, images: List[Tuple[str, str, str, str, Dict[str, str]]]) -> int:
+        """Record ``(repo, tag, digest, created, versions)`` images; returns how many were new."""
+        added = 0
+        with self._lock, self._conn:
+            for repo, tag, digest, created, versions in images:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO images (repo, tag, digest, created) VALUES (?, ?, ?, ?)",
+                    (repo, tag, digest, created))
+                if not cursor.rowcount:
+                    continue
+                image = cursor.lastrowid
+                self._conn.executemany("INSERT INTO packages (image, package, version) VALUES (?, ?, ?)",
+                                       [(image, name, version) for name, version in versions.items()])
+                added += 1
+        return added
+    
+    def versions(self, repo: str, tag: str) -> Optional[Dict[str, str]]:
+        """Package versions of an image, or None if it is not recorded."""
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM images WHERE repo = ? AND tag = ?", (repo, tag)).fetchone()
+            if row is None:
+                return None
+            return dict(self._conn.execute("SELECT package, version FROM packages WHERE image = ?", row))
+    
+    def repos(self, tag: str) -> List[str]:
+        """Repositories with an image recorded for a tag."""
+        with self._lock:
+            return [repo for repo, in self._conn.execute(
+                "SELECT repo FROM images WHERE tag = ? ORDER BY repo", (tag,))]
+    
+    def history(self, package: str, repo: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        """Every recorded ``(repo, tag, version)`` of a package, by repository and tag order.
+        
+        The HWE images of a repository come after its regular ones.
+        """
+        query = ("SELECT images.repo, images.tag, packages.version FROM packages "
+                 "JOIN images ON images.id = packages.image WHERE packages.package = ?")
+        params: Tuple[str, ...] = (package,)
+        if repo:
+            query += " AND images.repo = ?"
+            params += (repo,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return sorted(rows, key=lambda row: (row[0], row[1].endswith("-hwe"),
+                                             TagIndex.sort_key(row[1].removesuffix("-hwe"))))
+
+
+class RetryableError(ChangelogError):
+    """A transient failure worth retrying, optionally with a server-imposed delay."""
+    
+    def __init__(self, message: str, retry_after: Optional[float] = None, throttled: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.throttled = throttled
+
+
+class CircuitOpenError(ManifestFetchError):
+    """Raised without contacting a host whose circuit breaker is open."""
+    pass
+
+
+class RetryScheduler:
+    """Retry and rate-limit policy shared by every registry fetch of a run.
+    
+    Retries back off exponentially with jitter so that concurrent fetches
+    and parallel jobs do not retry in lockstep, and a ``Retry-After`` or
+    429 response pauses *all* fetches rather than just the one that saw it.
+    A token bucket caps the request rate across threads, each host gets a
+    circuit breaker that fails fast after repeated failures, and an overall
+    deadline bounds the time spent waiting out failures. All knobs live in
+    ``defaults``.
+    """
+    
+    def __init__(self, retries: int = 3, base_wait: float = 5, max_wait: float = 60,
+                 rate: float = 0, burst: int = 1, breaker_failures: int = 0,
+                 breaker_cooldown: float = 60, deadline: float = 0):
+        self.retries = max(1, retries)
+        self.base_wait = base_wait
+        self.max_wait = max(base_wait, max_wait)
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.deadline_seconds = deadline
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._failures: Dict[str, int] = defaultdict(int)
+        self._open_until: Dict[str, float] = {}
+        self.start_deadline()
+    
+    @classmethod
+    def from_config(cls, config: "Config") -> "RetryScheduler":
+        defaults = config.defaults
+        return cls(
+            retries=defaults.retries,
+            base_wait=defaults.retry_wait,
+            max_wait=defaults.retry_max_wait,
+            rate=defaults.rate_limit,
+            burst=defaults.rate_burst,
+            breaker_failures=defaults.circuit_breaker_failures,
+            breaker_cooldown=defaults.circuit_breaker_cooldown,
+            deadline=defaults.deadline_seconds,
+        )
+    
+    def start_deadline(self) -> None:
+        """(Re)start the overall deadline clock."""
+        self._deadline = time.monotonic() + self.deadline_seconds if self.deadline_seconds else None
+    
+    def remaining(self) -> float:
+        """Seconds left before the deadline (infinite without one)."""
+        if self._deadline is None:
+            return float("inf")
+        return self._deadline - time.monotonic()
+    
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with jitter for the given (zero-based) attempt."""
+        delay = min(self.max_wait, self.base_wait * (2 ** attempt))
+        return random.uniform(delay / 2, delay)
+    
+    def pause(self, seconds: float) -> None:
+        """Hold back every fetch for ``seconds``, e.g. after a 429 response."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+    
+    def acquire(self) -> None:
+        """Wait for a rate-limit token and any global pause.
+        
+        Only a pause counts against the deadline; waiting for a token is
+        the configured request rate at work, however many fetches queue up.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                paused = wait > 0
+                if wait <= 0 and self.rate > 0:
+                    self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+                    self._refilled = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                elif wait <= 0:
+                    return
+            if paused and wait > self.remaining():
+                raise ManifestFetchError("Deadline exceeded while waiting to contact the registry")
+            time.sleep(wait)
+    
+    def _check_circuit(self, host: str) -> None:
+        with self._lock:
+            open_until = self._open_until.get(host)
+            if open_until is None:
+                return
+            if time.monotonic() < open_until:
+                raise CircuitOpenError(f"Circuit breaker open for {host}, not contacting it")
+            # Half-open: let this call through as a probe
+            del self._open_until[host]
+    
+    def _record(self, host: str, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self._failures.pop(host, None)
+                return
+            self._failures[host] += 1
+            if self.breaker_failures and self._failures[host] >= self.breaker_failures:
+                self._open_until[host] = time.monotonic() + self.breaker_cooldown
+                logger.warning(f"Opening circuit breaker for {host} after "
+                               f"{self._failures[host]} consecutive failures")
+    
+    def run(self, host: str, what: str, operation: Callable[[], Any]) -> Any:
+        """Call ``operation`` until it succeeds, retrying on RetryableError.
+        
+        Other exceptions propagate immediately. The last RetryableError is
+        re-raised once the retries or the deadline are exhausted.
+        """
+        for attempt in range(self.retries):
+            self._check_circuit(host)
+            self.acquire()
+            try:
+                result = operation()
+            except RetryableError as e:
+                self._record(host, ok=False)
+                if attempt == self.retries - 1:
+                    raise
+                delay = e.retry_after if e.retry_after is not None else self.backoff(attempt)
+                if e.throttled:
+                    self.pause(delay)
+                if delay > self.remaining():
+                    logger.warning(f"{what}: {e}; deadline reached, giving up")
+                    raise
+                logger.warning(f"{what}: {e}, retrying in {delay:.1f} seconds "
+                               f"({attempt + 1}/{self.retries})")
+                tracer.count("retries")
+                tracer.count("retry_wait_seconds", delay)
+                with tracer.span("retry wait", "retry", what=what):
+                    time.sleep(delay)
+                continue
+            except Exception:
+                # The host answered; only transient failures count against it
+                self._record(host, ok=True)
+                raise
+            self._record(host, ok=True)
+            return result
+
+
+class RegistryError(ManifestFetchError):
+    """Exception raised by the native registry client."""
+    
+    def __init__(self, message: str, status: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class RegistryClient:
+    """Minimal OCI distribution API client used instead of ``skopeo inspect``.
+    
+    Keeps a pool of keep-alive HTTP connections per host, reuses anonymous
+    bearer tokens per repository scope, resolves digests with ``HEAD``
+    requests and reads ``Labels`` straight from the image config blob. The
+    registry URL may carry an explicit ``http://`` scheme, which is how a
+    local registry stand-in is addressed.
+    """
+    
+    MANIFEST_TYPES = ", ".join([
+        "application/vnd.oci.image.index.v1+json",
+        "application/vnd.docker.distribution.manifest.list.v2+json",
+        "application/vnd.oci.image.manifest.v1+json",
+        "application/vnd.docker.distribution.manifest.v2+json",
+    ])
+    INDEX_TYPES = (
+        "application/vnd.oci.image.index.v1+json",
+        "application/vnd.docker.distribution.manifest.list.v2+json",
+    )
+    ARCHITECTURES = {"x86_64": "amd64", "aarch64": "arm64", "arm64": "arm64"}
+    MAX_REDIRECTS = 5
+    # Token lifetime assumed when the token server does not say, and how
+    # long before it ends a token is renewed
+    TOKEN_LIFETIME = 60
+    TOKEN_MARGIN = 10
+    
+    def __init__(self, registry_url: str, timeout: float = 30, pool_size: int = 8):
+        parts = urlsplit(registry_url if "://" in registry_url else f"https://{registry_url}")
+        self.scheme = parts.scheme
+        self.host = parts.netloc
+        self.namespace = parts.path.strip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        import platform
+        machine = platform.machine().lower()
+        self.architecture = self.ARCHITECTURES.get(machine, machine)
+        self._pool: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = defaultdict(list)
+        # Repository name -> (bearer token, time after which it is renewed)
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+    
+    def close(self) -> None:
+        """Close all pooled connections."""
+        with self._lock:
+            for connections in self._pool.values():
+                for conn in connections:
+                    conn.close()
+            self._pool.clear()
+    
+    def _acquire(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        import http.client
+        with self._lock:
+            idle = self._pool[(scheme, netloc)]
+            if idle:
+                return idle.pop()
+        if scheme == "http":
+            return http.client.HTTPConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+    
+    def _release(self, scheme: str, netloc: str, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._pool[(scheme, netloc)]
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+        conn.close()
+    
+    def _send(self, method: str, url: str,
+              headers: Dict[str, str]) -> Tuple[int, http.client.HTTPMessage, bytes]:
+        """Send one request over a pooled connection, retrying once on a stale socket."""
+        import http.client
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        for attempt in range(2):
+            conn = self._acquire(parts.scheme, parts.netloc)
+            try:
+                with tracer.span(f"registry {method}", "registry", url=url):
+                    conn.request(method, path, headers=headers)
+                    response = conn.getresponse()
+                    body = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                if attempt:
+                    raise RegistryError(f"{method} {url} failed: {e}") from e
+                continue
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise RegistryError(f"{method} {url} failed: {e}") from e
+            
+            tracer.count("registry_requests")
+            tracer.count("bytes_fetched", len(body))
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(parts.scheme, parts.netloc, conn)
+            return response.status, response.headers, body
+        raise RegistryError(f"{method} {url} failed")
+    
+    def _fetch_token(self, challenge: str) -> Optional[Tuple[str, float]]:
+        """Obtain an anonymous bearer token for a ``WWW-Authenticate`` challenge.
+        
+        Returns the token and the time it should be renewed, from its ``expires_in``.
+        """
+        scheme, _, params = challenge.partition(" ")
+        if scheme.lower() != "bearer":
+            return None
+        fields = dict(re.findall(r'(\w+)="([^"]*)"', params))
+        realm = fields.pop("realm", None)
+        if not realm:
+            return None
+        status, _, body = self._send("GET", f"{realm}?{urlencode(fields)}", {})
+        if status != 200:
+            raise RegistryError(f"Token request to {realm} failed with HTTP {status}", status)
+        data = json.loads(body)
+        token = data.get("token") or data.get("access_token")
+        if not token:
+            return None
+        try:
+            lifetime = float(data.get("expires_in") or self.TOKEN_LIFETIME)
+        except (TypeError, ValueError):
+            lifetime = self.TOKEN_LIFETIME
+        return token, time.time() + max(0.0, lifetime - self.TOKEN_MARGIN)
+    
+    def request(self, method: str, repo: str, path: str,
+                accept: Optional[str] = None) -> Tuple[int, http.client.HTTPMessage, bytes]:
+        """Issue an authenticated request against ``/v2/<namespace>/<repo>/<path>``."""
+        name = f"{self.namespace}/{repo}" if self.namespace else repo
+        url = f"{self.scheme}://{self.host}/v2/{name}/{path}"
+        challenged = False
+        for _ in range(self.MAX_REDIRECTS):
+            headers = {"Accept": accept} if accept else {}
+            same_host = urlsplit(url).netloc == self.host
+            token, renew_at = self._tokens.get(name, (None, 0.0))
+            if token and same_host and time.time() < renew_at:
+                headers["Authorization"] = f"Bearer {token}"
+            
+            status, response_headers, body = self._send(method, url, headers)
+            # Answer the challenge once per request: there is no token yet, it
+            # expired, or the registry revoked it early
+            if status == 401 and same_host and not challenged:
+                challenged = True
+                self._tokens.pop(name, None)
+                token = self._fetch_token(response_headers.get("WWW-Authenticate", ""))
+                if token:
+                    self._tokens[name] = token
+                    continue
+            if status in (301, 302, 303, 307, 308) and response_headers.get("Location"):
+                url = urljoin(url, response_headers["Location"])
+                continue
+            if status >= 400:
+                raise RegistryError(f"{method} {url} returned HTTP {status}", status,
+                                    self._retry_after(response_headers.get("Retry-After")))
+            return status, response_headers, body
+        raise RegistryError(f"Too many redirects for {method} {url}")
+    
+    @staticmethod
+    def _retry_after(value: Optional[str]) -> Optional[float]:
+        """Parse a ``Retry-After`` header given in seconds or as an HTTP date."""
+        if not value:
+            return None
+        from email.utils import parsedate_to_datetime
+        if value.strip().isdigit():
+            return float(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    
+    def head_digest(self, repo: str, reference: str) -> str:
+        """Resolve a tag to its manifest digest without downloading the manifest."""
+        _, headers, _ = self.request("HEAD", repo, f"manifests/{reference}", self.MANIFEST_TYPES)
+        digest = headers.get("Docker-Content-Digest")
+        if not digest:
+            raise RegistryError(f"No digest returned for {repo}:{reference}")
+        return digest
+    
+    def get_manifest(self, repo: str, reference: str) -> Tuple[str, Dict[str, Any]]:
+        """Fetch an image manifest, resolving multi-arch indexes to this platform.
+        
+        Returns the digest of the top-level manifest (as ``skopeo inspect``
+        reports it) together with the platform-specific image manifest.
+        """
+        _, headers, body = self.request("GET", repo, f"manifests/{reference}", self.MANIFEST_TYPES)
+        digest = headers.get("Docker-Content-Digest") or f"sha256:{hashlib.sha256(body).hexdigest()}"
+        manifest = json.loads(body)
+        
+        if manifest.get("mediaType", headers.get("Content-Type")) in self.INDEX_TYPES:
+            candidates = [
+                m for m in manifest.get("manifests", [])
+                if m.get("platform", {}).get("os") == "linux"
+                and m.get("platform", {}).get("architecture") == self.architecture
+            ]
+            if not candidates:
+                raise RegistryError(f"No linux/{self.architecture} manifest for {repo}:{reference}")
+            _, _, body = self.request("GET", repo, f"manifests/{candidates[0]['digest']}", self.MANIFEST_TYPES)
+            manifest = json.loads(body)
+        return digest, manifest
+    
+    def get_blob(self, repo: str, digest: str) -> bytes:
+        """Download a blob, following redirects to the storage backend."""
+        _, _, body = self.request("GET", repo, f"blobs/{digest}")
+        return body
+    
+    def list_tags(self, repo: str, page_size: int = 1000,
+                  keep: Optional[Callable[[str], bool]] = None) -> List[str]:
+        """List the tags of a repository, following ``Link`` pagination.
+        
+        ``keep`` filters each page as it arrives so that only the tags of
+        interest are ever accumulated.
+        """
+        tags: List[str] = []
+        path = f"tags/list?n={page_size}"
+        while path:
+            _, headers, body = self.request("GET", repo, path)
+            page = json.loads(body).get("tags") or []
+            tags.extend(filter(keep, page) if keep else page)
+            match = re.search(r"<([^>]+)>;\s*rel=\"?next\"?", headers.get("Link", ""))
+            path = None
+            if match:
+                # The Link target is absolute (/v2/<name>/tags/list?...); keep only the suffix
+                path = "tags/list?" + urlsplit(match.group(1)).query
+        return tags
+    
+    def inspect(self, repo: str, reference: str) -> Dict[str, Any]:
+        """Return a ``skopeo inspect --no-tags`` compatible document for an image."""
+        digest, manifest = self.get_manifest(repo, reference)
+        config = json.loads(self.get_blob(repo, manifest["config"]["digest"]))
+        image_config = config.get("config") or {}
+        name = f"{self.namespace}/{repo}" if self.namespace else repo
+        return {
+            "Name": f"{self.host}/{name}",
+            "Digest": digest,
+            "RepoTags": [],
+            "Created": config.get("created"),
+            "Architecture": config.get("architecture"),
+            "Os": config.get("os"),
+            "Labels": image_config.get("Labels") or {},
+            "Layers": [layer["digest"] for layer in manifest.get("layers", [])],
+            "Env": image_config.get("Env") or [],
+        }
+
+
+class TagIndex:
+    """Release tags of one target across image variants, in release order.
+    
+    Each tag is parsed once into a numeric sort key (``lts.20250930.10``
+    becomes ``(20250930, 10)``) so that same-day rebuilds order correctly,
+    and variant membership is kept as a bitmask per tag. ``latest``,
+    ``previous`` and ``between`` only consider tags present in every variant.
+    ``-hwe`` tags are left out: they sort after their release and would
+    otherwise be taken for a newer one.
+    """
+    
+    def __init__(self, target: str, repo_tags: Dict[str, List[str]], pattern: Pattern[str]):
+        self.target = target
+        self.variants = list(repo_tags)
+        self.presence: Dict[str, int] = defaultdict(int)
+        for bit, tags in enumerate(repo_tags.values()):
+            for tag in tags:
+                # Tags ending with .0 should not exist
+                if not tag.endswith((".0", "-hwe")) and pattern.match(tag):
+                    self.presence[tag] |= 1 << bit
+        
+        everywhere = (1 << len(self.variants)) - 1
+        self.tags = sorted((tag for tag, mask in self.presence.items() if mask == everywhere),
+                           key=self.sort_key)
+        self._keys = [self.sort_key(tag) for tag in self.tags]
+        self._position = {tag: i for i, tag in enumerate(self.tags)}
+    
+    @staticmethod
+    def sort_key(tag: str) -> Tuple[Tuple[int, Any], ...]:
+        """Order tags by their numeric date/build components after the stream name."""
+        _, _, version = tag.partition(".")
+        return tuple((0, int(part)) if part.isdigit() else (1, part)
+                     for part in version.split("."))
+    
+    def __len__(self) -> int:
+        return len(self.tags)
+    
+    def __contains__(self, tag: str) -> bool:
+        return tag in self._position
+    
+    def latest(self) -> Optional[str]:
+        """The most recent tag."""
+        return self.tags[-1] if self.tags else None
+    
+    def previous(self, tag: str) -> Optional[str]:
+        """The tag released right before ``tag``."""
+        position = self._position.get(tag)
+        if position is None:
+            position = bisect.bisect_left(self._keys, self.sort_key(tag))
+        return self.tags[position - 1] if position > 0 else None
+    
+    def between(self, start: str, end: str) -> List[str]:
+        """Tags released after ``start`` up to and including ``end``."""
+        lo = bisect.bisect_right(self._keys, self.sort_key(start))
+        hi = bisect.bisect_right(self._keys, self.sort_key(end))
+        return self.tags[lo:hi]
+
+
+class Commit(NamedTuple):
+    """One commit as recorded in the commit index."""
+    githash: str
+    short: str
+    timestamp: int
+    parents: Tuple[str, ...]
+    subject: str
+
+
+def iter_git_log(workdir: str, *args: str, timeout: float = 30,
+                 chunk_size: int = 65536) -> Iterator[Commit]:
+    """Stream ``git log`` output as Commit records.
+    
+    Uses a NUL-terminated, unit-separated ``--pretty`` format read from the
+    pipe in fixed-size chunks, so memory stays flat however long the range
+    is and no field needs to be guessed from free-form text. Raises
+    CalledProcessError if git fails and TimeoutExpired if it runs longer
+    than ``timeout`` seconds.
+    """
+    command = ["git", "-C", workdir, "log", "-z",
+               "--pretty=format:%H%x1f%h%x1f%ct%x1f%P%x1f%s", *args]
+    with tracer.span("git log", "git", args=" ".join(args)), tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+        try:
+            pending = b""
+            while True:
+                chunk = process.stdout.read(chunk_size)
+                if not chunk:
+                    break
+                records = (pending + chunk).split(b"\0")
+                pending = records.pop()
+                for record in records:
+                    commit = _parse_log_record(record)
+                    if commit is not None:
+                        yield commit
+            commit = _parse_log_record(pending)
+            if commit is not None:
+                yield commit
+            
+            returncode = process.wait()
+            if not timer.is_alive() and returncode < 0:
+                raise subprocess.TimeoutExpired(command, timeout)
+            if returncode != 0:
+                stderr.seek(0)
+                raise subprocess.CalledProcessError(returncode, command, stderr=stderr.read())
+        finally:
+            timer.cancel()
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+
+
+def _parse_log_record(record: bytes) -> Optional[Commit]:
+    """Parse one ``iter_git_log`` record; malformed records yield None."""
+    fields = record.decode("utf-8", errors="replace").strip("\n").split("\x1f", 4)
+    if len(fields) < 5 or not fields[2].isdigit():
+        if record.strip():
+            logger.debug("Skipping malformed commit record: %r", record[:80])
+        return None
+    githash, short, timestamp, parents, subject = fields
+    return Commit(githash, short, int(timestamp), tuple(parents.split()), subject)
+
+
+class CommitIndex:
+    """Persistent index of the commits reachable from HEAD in a git work tree.
+    
+    The index is kept inside the repository's git directory and updated
+    incrementally from the last indexed HEAD, so repeated runs (and every
+    release of a backfill) resolve commit ranges and time windows without
+    walking the history with ``git log`` again. Commits are kept in
+    ``git log`` order, newest first.
+    """
+    
+    FILE_NAME = "bluefin-changelog-commits.json"
+    VERSION = 1
+    
+    def __init__(self, workdir: str, path: Path, timeout: float = 30):
+        self.workdir = workdir
+        self.path = path
+        self.timeout = timeout
+        self.head: Optional[str] = None
+        self.commits: List[Commit] = []
+        self._reindex()
+    
+    @classmethod
+    def open(cls, workdir: str, timeout: float = 30) -> "CommitIndex":
+        """Load the index of a work tree and bring it up to date with HEAD."""
+        with tracer.span("git rev-parse", "git"):
+            git_dir = subprocess.run(
+                ["git", "-C", workdir, "rev-parse", "--absolute-git-dir"],
+                check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout
+            ).stdout.decode("utf-8").strip()
+        index = cls(workdir, Path(git_dir) / cls.FILE_NAME, timeout)
+        index.load()
+        index.update()
+        return index
+    
+    def _git(self, *args: str) -> subprocess.CompletedProcess:
+        with tracer.span(f"git {args[0]}", "git"):
+            return subprocess.run(["git", "-C", self.workdir, *args],
+                                  stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=self.timeout)
+    
+    def _reindex(self) -> None:
+        self._position = {commit.githash: i for i, commit in enumerate(self.commits)}
+        by_time = sorted(range(len(self.commits)), key=lambda i: self.commits[i].timestamp)
+        self._by_time = by_time
+        self._times = [self.commits[i].timestamp for i in by_time]
+    
+    def load(self) -> None:
+        """Read the index from disk, ignoring a missing or outdated file."""
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if data.get("version") != self.VERSION:
+            return
+        self.head = data.get("head")
+        self.commits = [Commit(h, s, t, tuple(p), subj) for h, s, t, p, subj in data.get("commits", [])]
+        self._reindex()
+    
+    def save(self) -> None:
+        """Write the index atomically next to the repository's git data."""
+        data = json.dumps({
+            "version": self.VERSION,
+            "head": self.head,
+            "commits": [list(commit) for commit in self.commits],
+        }, separators=(",", ":"))
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp)
+            raise
+    
+    def _log(self, *revisions: str) -> List[Commit]:
+        return list(iter_git_log(self.workdir, *revisions, timeout=self.timeout))
+    
+    def update(self) -> None:
+        """Index the commits added since the last indexed HEAD."""
+        result = self._git("rev-parse", "HEAD")
+        if result.returncode != 0:
+            raise subprocess.CalledProcessError(result.returncode, "git rev-parse", result.stdout, result.stderr)
+        head = result.stdout.decode("utf-8").strip()
+        if head == self.head:
+            return
+        
+        if self.head and self._git("merge-base", "--is-ancestor", self.head, head).returncode == 0:
+            new = self._log(f"{self.head}..{head}")
+            logger.info(f"Adding {len(new)} commits to the commit index")
+            self.commits = new + self.commits
+        else:
+            self.commits = self._log(head)
+            logger.info(f"Indexed {len(self.commits)} commits")
+        self.head = head
+        self._reindex()
+        try:
+            self.save()
+        except OSError as e:
+            logger.warning(f"Failed to save commit index: {e}")
+    
+    def resolve(self, revision: str) -> Optional[str]:
+        """Full hash of an indexed commit given its full or abbreviated hash."""
+        if revision in self._position:
+            return revision
+        if len(revision) >= 7:
+            for githash in self._position:
+                if githash.startswith(revision):
+                    return githash
+        return None
+    
+    def range(self, start: str, finish: str) -> Optional[List[Commit]]:
+        """Commits reachable from ``finish`` but not ``start`` (``git log start..finish``).
+        
+        Returns None when either end is not in the index.
+        """
+        start, finish = self.resolve(start), self.resolve(finish)
+        if start is None or finish is None:
+            return None
+        
+        excluded = self._ancestors(start)
+        included = self._ancestors(finish, stop=excluded)
+        return sorted((self.commits[self._position[h]] for h in included),
+                      key=lambda commit: self._position[commit.githash])
+    
+    def _ancestors(self, githash: str, stop: Optional[Set[str]] = None) -> Set[str]:
+        seen: Set[str] = set()
+        pending = [githash]
+        while pending:
+            current = pending.pop()
+            if current in seen or (stop and current in stop) or current not in self._position:
+                continue
+            seen.add(current)
+            pending.extend(self.commits[self._position[current]].parents)
+        return seen
+    
+    def between(self, since: float, until: float) -> List[Commit]:
+        """Commits whose committer timestamp lies in ``[since, until]``, in log order."""
+        lo = bisect.bisect_left(self._times, since)
+        hi = bisect.bisect_right(self._times, until)
+        return [self.commits[i] for i in sorted(self._by_time[lo:hi])]
+
+
+class ChangelogTemplate:
+    """The ``changelog_format`` template compiled into literal and placeholder nodes.
+    
+    Only the placeholders the changelog understands are recognised, so any
+    other braces in the template are kept verbatim. Rendering walks the
+    nodes once and only looks up the ``{pkgrel:...}`` names that actually
+    occur in the template.
+    """
+    
+    PLACEHOLDER = re.compile(r"\{(handwritten|target|prev|curr|changes|pkgrel:[^{}]+)\}")
+    
+    def __init__(self, source: str):
+        self.nodes: List[Tuple[bool, str]] = []
+        position = 0
+        for match in self.PLACEHOLDER.finditer(source):
+            if match.start() > position:
+                self.nodes.append((False, source[position:match.start()]))
+            self.nodes.append((True, match.group(1)))
+            position = match.end()
+        if position < len(source):
+            self.nodes.append((False, source[position:]))
+        
+        self._index_packages()
+    
+    @classmethod
+    def from_nodes(cls, nodes: List[Tuple[bool, str]]) -> ChangelogTemplate:
+        """Rebuild a template from previously compiled ``nodes``."""
+        template = cls.__new__(cls)
+        template.nodes = list(nodes)
+        template._index_packages()
+        return template
+    
+    def _index_packages(self) -> None:
+        self.packages = [name[len("pkgrel:"):] for is_field, name in self.nodes
+                         if is_field and name.startswith("pkgrel:")]
+    
+    def render(self, fields: Dict[str, str], changes: List[str]) -> List[str]:
+        """Render to a list of chunks; ``changes`` chunks are spliced in as-is.
+        
+        ``fields`` maps placeholder names (``pkgrel:<name>`` included) to
+        their values; missing ``pkgrel`` values render as ``N/A``.
+        """
+        chunks = []
+        for is_field, value in self.nodes:
+            if not is_field:
+                chunks.append(value)
+            elif value == "changes":
+                chunks.extend(changes)
+            else:
+                chunks.append(fields.get(value, "N/A"))
+        return chunks
+
+
+class PackageDiff:
+    """Package membership across a target's image variants and the version diff, computed once.
+    
+    Every package gets a bitmask with bit ``i`` set when image ``i`` of the
+    target carries it in either release, and a status (added, changed or
+    removed; unchanged packages have none) from the merged version maps.
+    Changelog sections are projections over these two tables, so grouping
+    and diffing stay linear in the number of packages however many
+    variants there are.
+    """
+    
+    ADDED, CHANGED, REMOVED = "added", "changed", "removed"
+    
+    def __init__(self, images: List[str], prev_packages: Dict[str, Dict[str, str]],
+                 packages: Dict[str, Dict[str, str]], prev_versions: Dict[str, str],
+                 versions: Dict[str, str]):
+        self.images = images
+        self.masks: Dict[str, int] = {}
+        # Images that have a package table in either release
+        self.present = 0
+        masks = self.masks
+        for position, img in enumerate(images):
+            bit = 1 << position
+            for table in (packages.get(img), prev_packages.get(img)):
+                if table is None:
+                    continue
+                self.present |= bit
+                for name in table:
+                    masks[name] = masks.get(name, 0) | bit
+        self.names = sorted(masks)
+        
+        self.status: Dict[str, str] = {}
+        for name in self.names:
+            if name not in prev_versions:
+                self.status[name] = self.ADDED
+            elif name not in versions:
+                self.status[name] = self.REMOVED
+            elif prev_versions[name] != versions[name]:
+                self.status[name] = self.CHANGED
+    
+    def mask(self, images: Iterable[str]) -> int:
+        """Bitmask of the given images, restricted to those with package data."""
+        mask = 0
+        for img in images:
+            if img in self.images:
+                mask |= 1 << self.images.index(img)
+        return mask & self.present
+    
+    def carried_by_all(self, mask: int) -> List[str]:
+        """Sorted names of the packages carried by every image in ``mask`` (none if it is empty)."""
+        if not mask:
+            return []
+        masks = self.masks
+        return [name for name in self.names if masks[name] & mask == mask]
+
+
+@dataclass(slots=True)
+class ReleaseDiff:
+    """Everything a changelog says about one release, in machine-readable form.
+
+    Built from the manifests, tags and git history by
+    ``ChangelogGenerator.build_release_diff`` and turned into Markdown by
+    ``ChangelogGenerator.render_release``; the renderer needs nothing
+    else, so a saved diff can be rendered again without the registry.
+    Section entries carry the fields of the matching ``pattern_*``
+    template and commits those of ``commit_format``.
+    """
+    target: str
+    prev: str
+    curr: str
+    pretty: str
+    os: str = ""
+    # Image name -> {"prev": digest, "curr": digest}
+    images: Dict[str, Dict[str, Optional[str]]] = field(default_factory=dict)
+    # Source commit of each release: {"prev": hash, "curr": hash}
+    commit: Dict[str, str] = field(default_factory=dict)
+    # Versions of the packages named by the changelog template (and the kernel)
+    major_packages: Dict[str, Dict[str, Optional[str]]] = field(default_factory=dict)
+    hwe_kernel: Dict[str, Optional[str]] = field(default_factory=dict)
+    # [{"id", "title", "added": [...], "changed": [...], "removed": [...]}]
+    sections: List[Dict[str, Any]] = field(default_factory=list)
+    commits: List[Dict[str, str]] = field(default_factory=list)
+    # False when the HWE kernels or commits could not be looked up; never saved
+    complete: bool = True
+
+    SCHEMA = 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"schema": self.SCHEMA,
+                **{f.name: getattr(self, f.name) for f in fields(self) if f.name != "complete"}}
+
+    @classmethod
+    def from_dict(cls, data: Any) -> ReleaseDiff:
+        if not isinstance(data, dict) or data.get("schema") != cls.SCHEMA:
+            raise ChangelogError(f"Unsupported release diff (expected schema {cls.SCHEMA})")
+        try:
+            return cls(**{f.name: data[f.name] for f in fields(cls) if f.name in data})
+        except TypeError as e:
+            raise ChangelogError(f"Invalid release diff: {e}") from e
+
+
+# Registry errors as skopeo reports them, matched as whole phrases: a missing
+# image or repository is final, and throttling pauses every fetch
+_SKOPEO_MISSING = re.compile(r"\b(?:manifest unknown|name unknown)\b", re.IGNORECASE)
+_SKOPEO_THROTTLED = re.compile(r"\btoomanyrequests\b|\b429 too many requests\b", re.IGNORECASE)
+
+
+class ChangelogGenerator:
+    """Main class for generating changelogs from container manifests."""
+    
+    def __init__(self, config: Optional[Config] = None, use_cache: bool = True):
+        """Initialize the changelog generator with configuration."""
+        self.config = config or load_config()
+        self._store = ManifestStore.from_config(self.config) if use_cache else None
+        self.releases = GitHubReleases.from_config(self.config, use_cache)
+        self.history = PackageHistory.from_config(self.config)
+        self._backend = self.config.defaults.fetch_backend
+        if self._backend not in Defaults.BACKENDS:
+            raise ChangelogError(f"Unknown fetch_backend '{self._backend}'")
+        self._registry: Optional[RegistryClient] = None
+        self._native_failures = 0
+        self._scheduler = RetryScheduler.from_config(self.config)
+        self._registry_host = urlsplit(
+            self.config.registry_url if "://" in self.config.registry_url
+            else f"https://{self.config.registry_url}"
+        ).netloc
+        if self._backend != "skopeo":
+            self._registry = RegistryClient(
+                self.config.registry_url,
+                timeout=self.config.defaults.timeout_seconds,
+                pool_size=self.config.defaults.fetch_concurrency,
+            )
+        # The client ``_registry`` is reset to when ``auto`` stopped using it
+        self._native = self._registry
+        self._manifest_cache: Dict[str, Dict[str, ImageManifest]] = {}
+        self._manifest_errors: Dict[str, str] = {}
+        self._tag_cache: Dict[str, List[str]] = {}
+        self._tag_indexes: Dict[Tuple[str, Tuple[str, ...]], TagIndex] = {}
+        self._resolved_tags: Dict[str, Tuple[str, str]] = {}
+        self._package_tables: Dict[str, Tuple[Dict[str, str], Dict[str, str]]] = {}
+        self._normalized_versions: Dict[str, str] = {}
+        self._commit_indexes: Dict[str, Optional[CommitIndex]] = {}
+        self._cache_lock = threading.Lock()
+        # Fetches in progress, so that concurrent callers wait instead of fetching again
+        self._manifest_fetches: Dict[str, threading.Event] = {}
+        self._tag_fetches: Dict[str, threading.Event] = {}
+        self._index_opens: Dict[str, threading.Event] = {}
+        
+        # Patterns and templates are compiled when the config is loaded
+        self.centos_pattern = self.config.patterns.centos
+        self.start_patterns = self.config.patterns.start
+        self.changelog_template = self.config.templates.changelog_format
+        
+        # Everything in the configuration that a release diff depends on;
+        # output templates (other than the packages they name) are left out
+        blacklist = self.config.package_blacklist
+        self._diff_config_hash = hashlib.sha256(json.dumps({
+            "schema": ReleaseDiff.SCHEMA,
+            "os": self.config.os_name,
+            "variants": self.config.image_variants,
+            "blacklist": [sorted(blacklist.names), blacklist.rules.pattern if blacklist.rules else None],
+            "centos": self.centos_pattern.pattern,
+            "sections": self.config.sections,
+            "packages": self.changelog_template.packages,
+            "commits": self.config.defaults.enable_commits,
+        }, sort_keys=True).encode("utf-8")).hexdigest()
+        
+    def get_images(self, target: str) -> List[Tuple[str, str]]:
+        """Generate image names and experiences for a given target."""
+        images = []
+        base_name = "bluefin"  # Base image name is always "bluefin"
+        
+        for experience in self.config.image_variants:
+            img = base_name
+            
+            if "-hwe" in target:
+                images.append((img, target))
+                break
+                
+            # Add experience suffix if it's not empty
+            if experience:  # experience is like "", "-dx", "-gdx"
+                img += experience
+                
+            images.append((img, target))  # Use target instead of experience
+        return images
+    
+    def _image_ref(self, img: str, target: str) -> str:
+        """Registry reference for an image, without any URL scheme."""
+        registry = self.config.registry_url.split("://", 1)[-1]
+        return f"{registry}/{img}:{target}"
+    
+    def _run_skopeo_command(self, image_url: str,
+                            args: Tuple[str, ...] = ("inspect", "--no-tags")) -> Optional[bytes]:
+        """Run a skopeo command (``inspect`` by default) under the retry scheduler."""
+        command = ["skopeo", *args, image_url]
+        if self.config.registry_url.startswith("http://"):
+            command.insert(-1, "--tls-verify=false")
+        
+        def attempt() -> bytes:
+            try:
+                with tracer.span(f"skopeo {args[0]}", "skopeo", image=image_url):
+                    output = subprocess.run(
+                        command,
+                        check=True,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        timeout=self.config.defaults.timeout_seconds
+                    ).stdout
+                tracer.count("skopeo_calls")
+                tracer.count("bytes_fetched", len(output))
+                return output
+            except subprocess.CalledProcessError as e:
+                stderr = e.stderr.decode(errors="replace").strip() if e.stderr else ""
+                if stderr:
+                    logger.error(f"Error: {stderr}")
+                if _SKOPEO_MISSING.search(stderr):
+                    raise ManifestFetchError(f"{image_url} does not exist") from e
+                raise RetryableError(f"Failed to get {image_url} (exit code {e.returncode})",
+                                     throttled=bool(_SKOPEO_THROTTLED.search(stderr))) from e
+            except subprocess.TimeoutExpired as e:
+                raise RetryableError(f"Timeout getting {image_url}") from e
+            except FileNotFoundError as e:
+                raise ManifestFetchError("skopeo is not installed") from e
+        
+        try:
+            return self._scheduler.run(self._registry_host, f"skopeo {args[0]}", attempt)
+        except ChangelogError as e:
+            logger.warning(str(e))
+            return None
+    
+    def _run_native(self, what: str, operation: Callable[[], Any]) -> Any:
+        """Run a native registry operation under the retry scheduler.
+        
+        Connection errors, 429 and 5xx responses are retried (honoring
+        ``Retry-After``); other RegistryErrors propagate unchanged. With the
+        ``auto`` backend a connection error propagates immediately so that
+        the caller can fall back to skopeo.
+        """
+        def attempt() -> Any:
+            try:
+                return operation()
+            except RegistryError as e:
+                if e.status is None and self._backend == "auto":
+                    raise
+                if e.status is None or e.status == 429 or e.status >= 500:
+                    raise RetryableError(f"{what}: {e}", retry_after=e.retry_after,
+                                         throttled=e.status in (429, 503)) from e
+                raise
+        
+        result = self._scheduler.run(self._registry_host, what, attempt)
+        self._native_failures = 0
+        return result
+    
+    # Connection failures in a row after which ``auto`` stops trying the native client
+    NATIVE_FAILURE_LIMIT = 3
+    
+    def _skopeo_may_help(self, e: RegistryError) -> bool:
+        """Whether a failed native call is worth repeating with skopeo.
+        
+        Only with the ``auto`` backend: when the registry could not be
+        reached, or refused the anonymous token (skopeo may have
+        credentials in its ``auth.json``).
+        """
+        return self._backend == "auto" and (e.status is None or e.status in (401, 403))
+    
+    def _fall_back(self, e: RegistryError) -> None:
+        """Note a native call that is repeated with skopeo (see ``_skopeo_may_help``).
+        
+        Only repeated connection failures turn the native client off, until
+        the next ``renew``; anything else falls back for the one call.
+        """
+        if e.status is not None:
+            logger.warning(f"Registry refused access ({e}), trying skopeo")
+            return
+        with self._cache_lock:
+            if self._registry is None:
+                # Already turned off while this call was in flight
+                logger.debug("Registry unavailable (%s), falling back to skopeo", e)
+                return
+            self._native_failures += 1
+            failures = self._native_failures
+            dropped = failures >= self.NATIVE_FAILURE_LIMIT
+            if dropped:
+                self._registry = None
+        if dropped:
+            logger.warning(f"Registry unreachable {failures} times in a row ({e}), "
+                           f"using skopeo for the rest of the run")
+        else:
+            logger.warning(f"Registry unavailable ({e}), falling back to skopeo")
+    
+    def _run_native_inspect(self, img: str, target: str) -> Optional[bytes]:
+        """Inspect an image through the native registry client.
+        
+        Raises RegistryError when skopeo may succeed instead (see
+        ``_skopeo_may_help``), so that the caller can fall back to it.
+        """
+        try:
+            inspected = self._run_native(f"inspect {img}:{target}",
+                                         lambda: self._registry.inspect(img, target))
+            return json.dumps(inspected).encode("utf-8")
+        except RegistryError as e:
+            if self._skopeo_may_help(e):
+                raise
+            logger.warning(f"Failed to get {img}:{target}: {e}")
+        except (json.JSONDecodeError, KeyError, TypeError) as e:
+            logger.warning(f"Malformed registry response for {img}:{target}: {e}")
+        except ChangelogError as e:
+            logger.warning(str(e))
+        return None
+    
+    def _inspect(self, img: str, target: str) -> Optional[bytes]:
+        """Inspect an image with the configured backend."""
+        registry = self._registry
+        if registry is not None:
+            try:
+                return self._run_native_inspect(img, target)
+            except RegistryError as e:
+                self._fall_back(e)
+        return self._run_skopeo_command(f"docker://{self._image_ref(img, target)}")
+    
+    def _revalidate_cached(self, img: str, target: str, ref: str) -> Optional[ImageManifest]:
+        """Resolve a tag's digest with HEAD and serve the manifest from the cache if known."""
+        registry = self._registry
+        if registry is None:
+            return None
+        try:
+            digest = registry.head_digest(img, target)
+        except RegistryError as e:
+            logger.debug("HEAD %s:%s failed: %s", img, target, e)
+            return None
+        cached = self._store.get_digest(digest)
+        if cached is None:
+            return None
+        try:
+            manifest = ImageManifest.parse(cached)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+        self._store.put(ref, digest)
+        logger.info(f"Using cached manifest for {img}:{target} ({digest[:19]})")
+        return manifest
+    
+    def _fetch_manifest(self, img: str, target: str) -> Optional[ImageManifest]:
+        """Fetch a single image manifest, consulting the disk cache first.
+        
+        Only the fields the changelog uses are kept (see ImageManifest); the
+        full document is what goes into the disk cache.
+        """
+        ref = self._image_ref(img, target)
+        if self._store:
+            cached = self._store.get(ref, immutable=self._is_release_tag(target))
+            if cached is not None:
+                try:
+                    manifest = ImageManifest.parse(cached)
+                    logger.info(f"Using cached manifest for {img}:{target}")
+                    tracer.count("cache_hits")
+                    return manifest
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    logger.warning(f"Ignoring corrupt cached manifest for {img}:{target}")
+            
+            # A moving tag whose index entry expired may still point at a
+            # manifest we already have; a HEAD request is enough to tell.
+            manifest = self._revalidate_cached(img, target, ref)
+            if manifest is not None:
+                tracer.count("cache_revalidated")
+                return manifest
+            tracer.count("cache_misses")
+        
+        with tracer.span("fetch manifest", "fetch", image=f"{img}:{target}"):
+            output = self._inspect(img, target)
+        if output is None:
+            logger.error(f"Failed to get {img}:{target}")
+            return None
+            
+        try:
+            manifest = ImageManifest.parse(output)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.error(f"Failed to parse JSON for {img}:{target}: {e}")
+            return None
+        
+        if self._store and manifest.digest:
+            self._store.put(ref, manifest.digest, output)
+        return manifest
+    
+    def prefetch_manifests(self, targets: List[str]) -> None:
+        """Fetch manifests for several targets concurrently.
+        
+        Every (image, target) pair that is not cached yet is fetched in a
+        shared thread pool bounded by ``defaults.fetch_concurrency``. Results
+        are stored in the manifest cache; targets for which nothing could be
+        fetched are remembered so that ``get_manifests`` fails fast for them.
+        Targets another thread is already fetching are waited for instead.
+        """
+        with self._cache_lock:
+            pending, running = self._claim(
+                self._manifest_fetches, targets,
+                lambda target: target in self._manifest_cache or target in self._manifest_errors
+            )
+        try:
+            if pending:
+                self._fetch_targets(pending)
+        finally:
+            self._release(self._manifest_fetches, pending)
+        for event in running:
+            event.wait()
+    
+    def _claim(self, fetches: Dict[str, threading.Event], keys: Iterable[str],
+               done: Callable[[str], bool]) -> Tuple[List[str], List[threading.Event]]:
+        """Split the keys not ``done`` yet into those the caller is to fetch and fetches to wait for.
+        
+        Called with ``_cache_lock`` held; the caller hands its keys back with ``_release``.
+        """
+        mine, others = [], []
+        for key in dict.fromkeys(keys):
+            if done(key):
+                continue
+            event = fetches.get(key)
+            if event is None:
+                fetches[key] = threading.Event()
+                mine.append(key)
+            else:
+                others.append(event)
+        return mine, others
+    
+    def _release(self, fetches: Dict[str, threading.Event], keys: List[str]) -> None:
+        """Mark claimed fetches as finished, waking up whoever waits for them."""
+        with self._cache_lock:
+            for key in keys:
+                fetches.pop(key).set()
+    
+    def _fetch_targets(self, pending: List[str]) -> None:
+        jobs = [(img, target) for target in pending for img, _ in self.get_images(target)]
+        workers = max(1, min(self.config.defaults.fetch_concurrency, len(jobs)))
+        logger.info(f"Fetching {len(jobs)} manifests for {len(pending)} targets "
+                    f"({workers} concurrent)")
+        
+        with tracer.span("prefetch_manifests", targets=",".join(pending)), \
+                ThreadPoolExecutor(max_workers=workers, thread_name_prefix="skopeo") as pool:
+            futures = [(img, target, pool.submit(self._fetch_manifest, img, target))
+                       for img, target in jobs]
+            results: Dict[str, Dict[str, ImageManifest]] = {target: {} for target in pending}
+            # Collect in submission order so the base image stays first
+            for img, target, future in futures:
+                manifest = future.result()
+                if manifest is not None:
+                    results[target][img] = manifest
+        
+        with self._cache_lock:
+            for target, manifests in results.items():
+                if manifests:
+                    self._manifest_cache[target] = manifests
+                else:
+                    self._manifest_errors[target] = f"Failed to fetch any manifests for target '{target}'"
+        self._record_history([(img, target, manifest)
+                              for target, manifests in results.items() for img, manifest in manifests.items()])
+    
+    def _record_history(self, fetched: List[Tuple[str, str, ImageManifest]]) -> None:
+        """Add the release images among freshly fetched ones to the package history."""
+        import sqlite3
+        if self.history is None:
+            return
+        rows = []
+        for img, tag, manifest in fetched:
+            if not self._is_release_tag(tag) or not manifest.digest:
+                continue
+            tables = self._package_table(img, manifest)
+            if tables is not None:
+                rows.append((img, tag, manifest.digest, manifest.created, tables[1]))
+        if not rows:
+            return
+        try:
+            with tracer.span("record history", images=len(rows)):
+                added = self.history.record(rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to record package history: {e}")
+            return
+        if added:
+            logger.info(f"Recorded {added} images in the package history")
+    
+    def record_release(self, tag: str, manifests: Dict[str, ImageManifest]) -> None:
+        """Add images fetched through a moving tag to the package history as release ``tag``.
+        
+        The moving tag may already point at a newer build than the newest
+        release every variant has, so only images whose ``tag`` resolves to
+        the same digest (one ``HEAD`` request each) are recorded. Without
+        the native backend nothing is, as that would mean downloading the
+        manifests again.
+        """
+        registry = self._registry
+        if self.history is None or registry is None or self.recorded_versions(tag) is not None:
+            return
+        fetched = []
+        for img, manifest in manifests.items():
+            try:
+                digest = self._run_native(f"HEAD {img}:{tag}", lambda: registry.head_digest(img, tag))
+            except ChangelogError as e:
+                logger.debug("Not recording %s:%s: %s", img, tag, e)
+                continue
+            if digest == manifest.digest:
+                fetched.append((img, tag, manifest))
+        self._record_history(fetched)
+    
+    def recorded_versions(self, ref: str) -> Optional[Dict[str, str]]:
+        """Package versions of a release from the history alone (like ``get_versions``).
+        
+        None when there is no history or an image of the release is missing from it.
+        """
+        import sqlite3
+        if self.history is None:
+            return None
+        versions: Dict[str, str] = {}
+        try:
+            for img, _ in self.get_images(ref):
+                recorded = self.history.versions(img, ref)
+                if recorded is None:
+                    return None
+                versions.update(recorded)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read package history: {e}")
+            return None
+        return versions
+    
+    def prefetch_hwe(self, tags: List[str]) -> None:
+        """Fetch the HWE manifests of release tags whose HWE versions are not recorded."""
+        self.prefetch_manifests([tag + "-hwe" for tag in tags
+                                 if self.recorded_versions(tag + "-hwe") is None])
+    
+    def preload_manifests(self, manifests_by_ref: Dict[str, Optional[Dict[str, ImageManifest]]]) -> None:
+        """Seed the manifest cache with already fetched manifests (None marks a failed ref)."""
+        with self._cache_lock:
+            for ref, manifests in manifests_by_ref.items():
+                if manifests:
+                    self._manifest_cache[ref] = manifests
+                else:
+                    self._manifest_errors[ref] = f"Failed to fetch any manifests for target '{ref}'"
+    
+    def cached_manifests(self, ref: str) -> Optional[Dict[str, ImageManifest]]:
+        """Return the manifests of a ref if they were fetched successfully, without fetching."""
+        with self._cache_lock:
+            return self._manifest_cache.get(ref)
+    
+    def poll_digests(self, target: str) -> Tuple[str, ...]:
+        """Digests the tag ``target`` points at in each image repository.
+        
+        This is what ``--watch`` compares between polls: one ``HEAD``
+        request per image with the native backend, the raw manifest with
+        skopeo. Raises ManifestFetchError if an image cannot be resolved.
+        """
+        with tracer.span("poll digests", target=target):
+            return tuple(self._poll_digest(img, target) for img, _ in self.get_images(target))
+    
+    def _poll_digest(self, img: str, target: str) -> str:
+        registry = self._registry
+        if registry is not None:
+            try:
+                return self._run_native(f"HEAD {img}:{target}", lambda: registry.head_digest(img, target))
+            except RegistryError as e:
+                if not self._skopeo_may_help(e):
+                    raise ManifestFetchError(f"Failed to resolve {img}:{target}: {e}") from e
+                self._fall_back(e)
+        output = self._run_skopeo_command(f"docker://{self._image_ref(img, target)}", ("inspect", "--raw"))
+        if output is None:
+            raise ManifestFetchError(f"Failed to resolve {img}:{target}")
+        return f"sha256:{hashlib.sha256(output).hexdigest()}"
+    
+    def tag_moved(self, target: str, digests: Tuple[str, ...]) -> None:
+        """Forget the manifests and tag lists of ``target`` after ``poll_digests`` saw it move.
+        
+        The disk cache entries of its refs are pointed at the new digests,
+        so the next fetch cannot serve the images the tag pointed at before.
+        """
+        images = [img for img, _ in self.get_images(target)]
+        with self._cache_lock:
+            self._manifest_cache.pop(target, None)
+            self._manifest_errors.pop(target, None)
+            for img in images:
+                self._tag_cache.pop(img, None)
+            for key in [key for key in self._tag_indexes if key[0] == target]:
+                del self._tag_indexes[key]
+        if self._store:
+            for img, digest in zip(images, digests):
+                self._store.put(self._image_ref(img, target), digest)
+    
+    def renew(self) -> None:
+        """Get a long-lived generator (see ``--watch``) ready for another run.
+        
+        Restarts the registry retry deadline, forgets failed fetches, the
+        GitHub release list and an unreachable registry, and brings commit
+        indexes up to date with their work trees. Everything immutable stays
+        cached.
+        """
+        self._scheduler.start_deadline()
+        self.releases.refresh()
+        with self._cache_lock:
+            self._manifest_errors.clear()
+            # Give a registry that was unreachable during the last run another chance
+            self._registry = self._native
+            self._native_failures = 0
+            indexes = dict(self._commit_indexes)
+        for workdir, index in indexes.items():
+            if index is None:
+                continue
+            try:
+                index.update()
+            except (subprocess.SubprocessError, OSError) as e:
+                logger.warning(f"Commit index unavailable, falling back to git log: {e}")
+                with self._cache_lock:
+                    self._commit_indexes[workdir] = None
+    
+    def get_manifests(self, target: str) -> Dict[str, ImageManifest]:
+        """Fetch container manifests for all image variants."""
+        # Check cache first
+        if target in self._manifest_cache:
+            logger.info(f"Using cached manifest for {target}")
+            tracer.count("memory_cache_hits")
+            return self._manifest_cache[target]
+        
+        if target not in self._manifest_errors:
+            logger.info(f"Fetching manifests for {len(self.get_images(target))} images with target '{target}'")
+            self.prefetch_manifests([target])
+        
+        if target in self._manifest_errors:
+            raise ManifestFetchError(self._manifest_errors[target])
+        return self._manifest_cache[target]
+
+    def _is_release_tag(self, tag: str) -> bool:
+        """Whether a tag is a dated (and therefore immutable) release tag of any target."""
+        return any(pattern.match(tag) for pattern in self.start_patterns.values())
+    
+    def _list_repo_tags(self, img: str) -> List[str]:
+        """Query the release tags of one repository."""
+        registry = self._registry
+        if registry is not None:
+            try:
+                return self._run_native(f"list tags of {img}",
+                                        lambda: registry.list_tags(img, keep=self._is_release_tag))
+            except RegistryError as e:
+                if not self._skopeo_may_help(e):
+                    raise TagDiscoveryError(f"Failed to list tags for {img}: {e}") from e
+                self._fall_back(e)
+            except ChangelogError as e:
+                raise TagDiscoveryError(f"Failed to list tags for {img}: {e}") from e
+        
+        registry = self.config.registry_url.split("://", 1)[-1]
+        output = self._run_skopeo_command(f"docker://{registry}/{img}", ("list-tags",))
+        if output is None:
+            raise TagDiscoveryError(f"Failed to list tags for {img}")
+        try:
+            return [tag for tag in json.loads(output).get("Tags") or [] if self._is_release_tag(tag)]
+        except (json.JSONDecodeError, AttributeError) as e:
+            raise TagDiscoveryError(f"Failed to parse tag list for {img}: {e}") from e
+    
+    def get_repo_tags(self, images: List[str]) -> Dict[str, List[str]]:
+        """Return the release tags of each repository, listing each one only once per run."""
+        with self._cache_lock:
+            missing, running = self._claim(self._tag_fetches, images, lambda img: img in self._tag_cache)
+        try:
+            if missing:
+                logger.info(f"Listing tags for {len(missing)} repositories")
+                workers = max(1, min(self.config.defaults.fetch_concurrency, len(missing)))
+                with tracer.span("list tags", repositories=len(missing)), \
+                        ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tags") as pool:
+                    listed = dict(zip(missing, pool.map(self._list_repo_tags, missing)))
+                with self._cache_lock:
+                    self._tag_cache.update(listed)
+        finally:
+            self._release(self._tag_fetches, missing)
+        for event in running:
+            event.wait()
+        with self._cache_lock:
+            if all(img in self._tag_cache for img in images):
+                return {img: self._tag_cache[img] for img in images}
+        # A listing another thread ran failed; list (and report) it here
+        return self.get_repo_tags(images)
+    
+    def get_tag_index(self, target: str, images: List[str]) -> TagIndex:
+        """Return the tag index of a target over the given image repositories."""
+        key = (target, tuple(images))
+        index = self._tag_indexes.get(key)
+        if index is None:
+            repo_tags = self.get_repo_tags(images)
+            with tracer.span("build tag index", target=target):
+                index = TagIndex(target, repo_tags, self.start_patterns[target])
+            self._tag_indexes[key] = index
+        return index
+    
+    def get_tags(self, target: str, manifests: Dict[str, ImageManifest], previous_tag: Optional[str] = None) -> Tuple[str, str]:
+        """Extract previous and current tags from the repositories of the given manifests."""
+        if not manifests:
+            raise TagDiscoveryError("No manifests provided for tag discovery")
+        
+        # The tags found for the same current images are remembered between runs,
+        # for as long as moving tags are; a newer release may be tagged meanwhile
+        key = self._digests_key("tags", target, previous_tag, self.start_patterns[target].pattern,
+                                _manifest_digests(manifests))
+        if key in self._resolved_tags:
+            return self._resolved_tags[key]
+        if key and self._store:
+            cached = self._store.get_digest(key)
+            try:
+                entry = json.loads(cached) if cached is not None else None
+                fresh = time.time() - entry["resolved"] <= self._store.tag_ttl
+            except (ValueError, TypeError, KeyError):
+                fresh = False
+            if fresh:
+                prev_tag, current_tag = entry["tags"]
+                logger.info(f"Using cached tags for {target}: {prev_tag} -> {current_tag}")
+                tracer.count("cache_hits")
+                self._resolved_tags[key] = prev_tag, current_tag
+                return prev_tag, current_tag
+        
+        prev_tag, current_tag = self._discover_tags(target, manifests, previous_tag)
+        if key:
+            self._resolved_tags[key] = prev_tag, current_tag
+            if self._store:
+                entry = {"tags": [prev_tag, current_tag], "resolved": time.time()}
+                self._store.put_blob(key, json.dumps(entry).encode("utf-8"))
+        return prev_tag, current_tag
+    
+    def _discover_tags(self, target: str, manifests: Dict[str, ImageManifest],
+                       previous_tag: Optional[str]) -> Tuple[str, str]:
+        index = self.get_tag_index(target, list(manifests))
+        if len(index) < 1:
+            raise TagDiscoveryError(
+                f"No tags found for target '{target}'. "
+                f"Available tags: {index.tags}"
+            )
+        
+        current_tag = index.latest()
+        
+        # Use provided previous_tag or fall back to automatic detection
+        if previous_tag:
+            logger.info(f"Using provided previous tag: {previous_tag}")
+            prev_tag = previous_tag
+        else:
+            prev_tag = index.previous(current_tag)
+            if prev_tag is None:
+                raise TagDiscoveryError(
+                    f"Insufficient tags found for target '{target}' and no previous tag provided. "
+                    f"Found {len(index)} tags, need at least 2 or explicit previous tag. "
+                    f"Available tags: {index.tags}"
+                )
+            logger.info(f"Auto-detected previous tag: {prev_tag}")
+            
+        logger.info(f"Found {len(index)} tags for target '{target}'")
+        logger.info(f"Comparing {prev_tag} -> {current_tag}")
+        return prev_tag, current_tag
+    
+    def _package_table(self, img: str, manifest: ImageManifest) -> Optional[Tuple[Dict[str, str], Dict[str, str]]]:
+        """Return the (raw, normalized) package tables of a manifest.
+        
+        Normalized tables are keyed by image digest, so the same image
+        reached through several tags or calls is only normalized once per run.
+        """
+        packages = manifest.packages
+        if packages is None:
+            if manifest.package_error and manifest.package_error.startswith("No rechunk info"):
+                logger.warning(f"{manifest.package_error} for {img}")
+            else:
+                logger.error(f"{manifest.package_error} for {img}")
+            return None
+        
+        tables = self._package_tables.get(manifest.digest) if manifest.digest else None
+        if tables is None:
+            normalized = {name: self._normalize_version(version) for name, version in packages.items()}
+            tables = (packages, normalized)
+            if manifest.digest:
+                self._package_tables[manifest.digest] = tables
+            logger.debug("Extracted %d packages for %s", len(packages), img)
+        return tables
+    
+    def _normalize_version(self, version: str) -> str:
+        """Strip the CentOS dist tag from a version, memoized across manifests."""
+        normalized = self._normalized_versions.get(version)
+        if normalized is None:
+            normalized = self._normalized_versions[version] = self.centos_pattern.sub("", version)
+        return normalized
+    
+    def get_packages(self, manifests: Dict[str, ImageManifest]) -> Dict[str, Dict[str, str]]:
+        """Extract package information from manifests."""
+        packages = {}
+        for img, manifest in manifests.items():
+            tables = self._package_table(img, manifest)
+            if tables is not None:
+                packages[img] = tables[0]
+        return packages
+
+    def get_package_groups(self, target: str, prev: Dict[str, ImageManifest], 
+                          manifests: Dict[str, ImageManifest]) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Categorize packages into common and variant-specific groups."""
+        with tracer.span("get_package_groups", target=target):
+            return self._package_groups(target, prev, manifests)
+    
+    def _package_groups(self, target: str, prev: Dict[str, ImageManifest],
+                        manifests: Dict[str, ImageManifest]) -> Tuple[List[str], Dict[str, List[str]]]:
+        diff = self.get_package_diff(target, prev, manifests)
+        return self._project_groups(target, diff)
+    
+    def get_package_diff(self, target: str, prev: Dict[str, ImageManifest], manifests: Dict[str, ImageManifest],
+                         prev_versions: Optional[Dict[str, str]] = None,
+                         versions: Optional[Dict[str, str]] = None) -> PackageDiff:
+        """Build the package membership matrix and version diff of two releases."""
+        if versions is None:
+            versions = self.get_versions(manifests)
+        if prev_versions is None:
+            prev_versions = self.get_versions(prev)
+        images = [img for img, _ in self.get_images(target)]
+        return PackageDiff(images, self.get_packages(prev), self.get_packages(manifests),
+                           prev_versions, versions)
+    
+    def _project_groups(self, target: str, diff: PackageDiff) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Common packages (carried by every image) and the packages of each section.
+        
+        A section holds the packages carried by all of its images that are
+        not common. The ``base`` and ``dx`` sections only take images whose
+        experience matches their name.
+        """
+        common = diff.carried_by_all(diff.present)
+        common_set = set(common)
+        
+        others = {}
+        for section in self.config.sections:
+            images = [img for img, experience in self.get_images(target)
+                      if section not in ("base", "dx") or experience == section]
+            others[section] = [name for name in diff.carried_by_all(diff.mask(images))
+                               if name not in common_set]
+        return common, others
+    
+    def get_versions(self, manifests: Dict[str, ImageManifest]) -> Dict[str, str]:
+        """Extract package versions from manifests."""
+        versions = {}
+        for img, manifest in manifests.items():
+            tables = self._package_table(img, manifest)
+            if tables is not None:
+                versions.update(tables[1])
+        return versions
+
+
+    def calculate_changes(self, pkgs: List[str], prev: Dict[str, str], 
+                         curr: Dict[str, str]) -> str:
+        """Calculate package changes between versions."""
+        return "".join(self._render_change_rows(self._change_entries(pkgs, prev, curr)))
+    
+    def _render_change_rows(self, entries: Dict[str, List[Dict[str, str]]]) -> Iterator[str]:
+        """Render the entries of one ``ReleaseDiff`` section as table rows."""
+        templates = self.config.templates
+        for entry in entries["added"]:
+            yield templates.pattern_add.format(**entry)
+        for entry in entries["changed"]:
+            yield templates.pattern_change.format(**entry)
+        for entry in entries["removed"]:
+            yield templates.pattern_remove.format(**entry)
+    
+    def _change_entries(self, pkgs: List[str], prev: Dict[str, str], curr: Dict[str, str],
+                        diff: Optional[PackageDiff] = None) -> Dict[str, List[Dict[str, str]]]:
+        """Sort packages into added, changed and removed entries, skipping blacklisted ones.
+        
+        With a ``diff`` the status of each package is read from its table
+        instead of being derived from the version maps again.
+        """
+        added = []
+        changed = []
+        removed = []
+        
+        blacklist = self.config.package_blacklist
+        blacklist_ver = {curr[v] for v in blacklist.matching(curr) if curr[v]}
+        status = diff.status if diff is not None else None
+        
+        for pkg in pkgs:
+            # Clean up changelog by removing mentioned packages
+            if pkg in blacklist:
+                continue
+            if pkg in curr and curr.get(pkg) in blacklist_ver:
+                continue
+            if pkg in prev and prev.get(pkg) in blacklist_ver:
+                continue
+                
+            if status is not None:
+                state = status.get(pkg)
+            elif pkg not in prev:
+                state = PackageDiff.ADDED
+            elif pkg not in curr:
+                state = PackageDiff.REMOVED
+            else:
+                state = PackageDiff.CHANGED if prev[pkg] != curr[pkg] else None
+            
+            if state == PackageDiff.ADDED:
+                added.append(pkg)
+            elif state == PackageDiff.REMOVED:
+                removed.append(pkg)
+            elif state == PackageDiff.CHANGED:
+                changed.append(pkg)
+                
+            # Add current versions to blacklist
+            if pkg in curr:
+                blacklist_ver.add(curr[pkg])
+            if pkg in prev:
+                blacklist_ver.add(prev[pkg])
+        
+        logger.info(f"Package changes: {len(added)} added, {len(changed)} changed, {len(removed)} removed")
+        
+        return {
+            "added": [{"name": pkg, "version": curr[pkg]} for pkg in added],
+            "changed": [{"name": pkg, "prev": prev[pkg], "new": curr[pkg]} for pkg in changed],
+            "removed": [{"name": pkg, "version": prev[pkg]} for pkg in removed],
+        }
+    
+    def get_commits(self, prev_manifests: Dict[str, ImageManifest], 
+                   manifests: Dict[str, ImageManifest], target: str, workdir: Optional[str] = None) -> str:
+        """Extract commit information between versions."""
+        commits = self.collect_commits(prev_manifests, manifests, target, workdir)
+        return "".join(self._render_commits(commits or []))
+    
+    def _render_commits(self, commits: List[Dict[str, str]]) -> List[str]:
+        """Render ``ReleaseDiff`` commit entries as the commits section."""
+        commit_format = self.config.templates.commit_format
+        return self.config.templates.commits_format.wrap([commit_format.format(**commit) for commit in commits])
+    
+    def collect_commits(self, prev_manifests: Dict[str, ImageManifest], manifests: Dict[str, ImageManifest],
+                         target: str, workdir: Optional[str]) -> Optional[List[Dict[str, str]]]:
+        """Commits between two releases, as ``githash``/``short``/``subject`` entries.
+        
+        None if the git history could not be read, as opposed to an empty
+        list when there are no commits to show.
+        """
+        with tracer.span("commits", target=target):
+            return self._find_commits(prev_manifests, manifests, target, workdir)
+    
+    def _find_commits(self, prev_manifests: Dict[str, ImageManifest], manifests: Dict[str, ImageManifest],
+                      target: str, workdir: Optional[str]) -> Optional[List[Dict[str, str]]]:
+        # Check if commits are enabled in configuration
+        if not self.config.defaults.enable_commits:
+            logger.debug("Commit extraction disabled in configuration")
+            return []
+            
+        if not workdir:
+            logger.warning("No workdir provided, skipping commit extraction")
+            return []
+            
+        try:
+            # Get commit hashes from container manifests
+            start = self._get_commit_hash(prev_manifests)
+            finish = self._get_commit_hash(manifests)
+            
+            if not start or not finish:
+                logger.warning("Missing commit hashes, skipping commit extraction")
+                return []
+            
+            if start == finish:
+                logger.info("Same commit hash for both versions, no commits to show")
+                return []
+            
+            logger.info(f"Extracting commits from {start[:7]} to {finish[:7]}")
+            
+            index = self._get_commit_index(workdir)
+            commits = index.range(start, finish) if index is not None else None
+            if commits is None:
+                # Only commits reachable from HEAD are indexed; git may still know the others,
+                # and if it does not either, the timestamps below are tried
+                if index is not None:
+                    logger.debug("Commit range %s..%s not in the commit index, using git log", start[:7], finish[:7])
+                commits = iter_git_log(workdir, f"{start}..{finish}")
+            
+            entries = self._commit_entries(
+                ((c.githash, c.short, c.subject) for c in commits),
+                # Skip merge commits and chore commits
+                lambda subject: not subject.lower().startswith(("merge", "chore"))
+            )
+            
+            logger.info(f"Found {len(entries)} relevant commits")
+            return entries
+            
+        except subprocess.CalledProcessError as e:
+            # Check if the error is due to unknown revision (commit not in repo)
+            stderr_output = e.stderr.decode() if e.stderr else ""
+            if any(message in stderr_output.lower()
+                   for message in ("unknown revision", "bad revision", "invalid revision range")):
+                logger.warning(f"Container commit hashes not found in git repository - trying timestamp-based approach")
+                logger.debug("Git error: %s", stderr_output)
+                return self._commits_by_timestamp(prev_manifests, manifests, workdir)
+            else:
+                logger.warning(f"Git command failed: {stderr_output}")
+            return None
+        except subprocess.TimeoutExpired:
+            logger.error("Git command timed out")
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to get commits: {e}")
+            return None
+    
+    def _get_commit_index(self, workdir: str) -> Optional[CommitIndex]:
+        """Open (once per run) the commit index of a work tree, or None if unavailable."""
+        if not self.config.defaults.commit_index:
+            return None
+        # Opening may walk the whole history, so it happens outside the cache lock
+        with self._cache_lock:
+            mine, running = self._claim(self._index_opens, [workdir], lambda key: key in self._commit_indexes)
+        try:
+            if mine:
+                try:
+                    index = CommitIndex.open(workdir, self.config.defaults.timeout_seconds)
+                except (subprocess.SubprocessError, OSError, ValueError) as e:
+                    logger.warning(f"Commit index unavailable, falling back to git log: {e}")
+                    index = None
+                with self._cache_lock:
+                    self._commit_indexes[workdir] = index
+        finally:
+            self._release(self._index_opens, mine)
+        for event in running:
+            event.wait()
+        with self._cache_lock:
+            return self._commit_indexes.get(workdir)
+    
+    @staticmethod
+    def _commit_entries(commits: Iterable[Tuple[str, str, str]],
+                        keep: Callable[[str], bool]) -> List[Dict[str, str]]:
+        """Entries for the (hash, short hash, subject) triples whose subject passes ``keep``."""
+        return [
+            {"githash": githash, "short": short, "subject": subject}
+            for githash, short, subject in commits
+            if keep(subject)
+        ]
+    
+    @staticmethod
+    def _keep_timestamp_commit(subject: str) -> bool:
+        """Skip some chore commits but include dependency updates."""
+        lowered = subject.lower()
+        return not lowered.startswith("chore") or any(
+            keyword in lowered for keyword in ["deps", "update", "bump"]
+        )
+    
+    def _commits_by_timestamp(self, prev_manifests: Dict[str, ImageManifest],
+                              manifests: Dict[str, ImageManifest], workdir: str) -> Optional[List[Dict[str, str]]]:
+        """Commit entries found by correlating container timestamps with the git history."""
+        try:
+            from datetime import datetime, timedelta
+            import re
+            
+            # Get container creation timestamps
+            prev_timestamp = self._get_container_timestamp(prev_manifests)
+            curr_timestamp = self._get_container_timestamp(manifests)
+            
+            logger.debug("Container timestamps: prev=%s, curr=%s", prev_timestamp, curr_timestamp)
+            
+            if not prev_timestamp or not curr_timestamp:
+                logger.warning("Missing container timestamps for commit correlation")
+                return []
+            
+            # Parse ISO 8601 timestamps
+            def parse_timestamp(ts):
+                # Remove microseconds and timezone info for simpler parsing
+                ts = re.sub(r'\.\d+', '', ts)  # Remove microseconds
+                ts = ts.replace('Z', '+00:00')  # Handle Z timezone
+                return datetime.fromisoformat(ts.replace('Z', '+00:00'))
+            
+            prev_dt = parse_timestamp(prev_timestamp)
+            curr_dt = parse_timestamp(curr_timestamp)
+            
+            logger.info(f"Searching commits between {prev_dt.strftime('%Y-%m-%d %H:%M')} and {curr_dt.strftime('%Y-%m-%d %H:%M')}")
+            
+            # Add some buffer time to account for build delays
+            start_time = prev_dt - timedelta(hours=2)
+            end_time = curr_dt + timedelta(hours=2)
+            
+            logger.debug("Git time range: %s to %s", start_time, end_time)
+            
+            index = self._get_commit_index(workdir)
+            if index is not None:
+                # git reads --since/--until as local wall-clock minutes; do the same
+                since, until = (
+                    datetime.strptime(t.strftime('%Y-%m-%d %H:%M'), '%Y-%m-%d %H:%M').timestamp()
+                    for t in (start_time, end_time)
+                )
+                commits = (c for c in index.between(since, until) if len(c.parents) < 2)
+            else:
+                # Use git log with date range
+                git_args = [
+                    f"--since={start_time.strftime('%Y-%m-%d %H:%M')}",
+                    f"--until={end_time.strftime('%Y-%m-%d %H:%M')}",
+                    "--no-merges"
+                ]
+                logger.debug("Git log arguments: %s", git_args)
+                commits = iter_git_log(workdir, *git_args)
+            
+            entries = self._commit_entries(
+                ((c.githash, c.short, c.subject) for c in commits),
+                self._keep_timestamp_commit
+            )
+            
+            logger.info(f"Found {len(entries)} commits in timestamp range")
+            return entries
+            
+        except Exception as e:
+            logger.warning(f"Timestamp-based commit search failed: {e}")
+            return None
+    
+    def _get_commit_hash(self, manifests: Dict[str, ImageManifest]) -> str:
+        """Extract commit hash from manifest labels."""
+        if not manifests:
+            return ""
+            
+        labels = next(iter(manifests.values())).labels
+        
+        # Try different label keys for commit hash
+        commit_hash = (labels.get("org.opencontainers.image.revision") or 
+                      labels.get("ostree.commit") or 
+                      labels.get("org.opencontainers.image.source") or "")
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Available labels: %s", list(labels))
+        logger.debug("Extracted commit hash: %s", commit_hash)
+        
+        return commit_hash
+    
+    def _get_container_timestamp(self, manifests: Dict[str, ImageManifest]) -> str:
+        """Extract creation timestamp from manifest."""
+        if not manifests:
+            return ""
+            
+        manifest = next(iter(manifests.values()))
+        return manifest.labels.get("org.opencontainers.image.created", manifest.created)
+
+    def get_hwe_kernel_change(self, prev: str, curr: str, target: str) -> Tuple[Optional[str], Optional[str]]:
+        """Get HWE kernel version changes."""
+        try:
+            return self._hwe_kernel_change(prev, curr)
+        except Exception as e:
+            logger.error(f"Failed to get HWE kernel versions: {e}")
+            return (None, None)
+    
+    def _hwe_kernel_change(self, prev: str, curr: str) -> Tuple[Optional[str], Optional[str]]:
+        """The (current, previous) HWE kernels; raises if the HWE images cannot be read."""
+        hwe_curr_versions = self.recorded_versions(curr + "-hwe")
+        hwe_prev_versions = self.recorded_versions(prev + "-hwe")
+        if hwe_curr_versions is not None and hwe_prev_versions is not None:
+            logger.info(f"Using recorded HWE versions for {curr}-hwe and {prev}-hwe")
+        else:
+            logger.info(f"Fetching HWE manifests for {curr}-hwe and {prev}-hwe...")
+            self.prefetch_manifests([curr + "-hwe", prev + "-hwe"])
+            hwe_curr_manifest = self.get_manifests(curr + "-hwe")
+            hwe_prev_manifest = self.get_manifests(prev + "-hwe")
+            
+            if not hwe_curr_manifest or not hwe_prev_manifest:
+                raise ManifestFetchError("One or both HWE manifests are empty")
+                
+            hwe_curr_versions = self.get_versions(hwe_curr_manifest)
+            hwe_prev_versions = self.get_versions(hwe_prev_manifest)
+        
+        curr_kernel = hwe_curr_versions.get("kernel")
+        prev_kernel = hwe_prev_versions.get("kernel")
+        logger.debug("HWE kernel versions: %s -> %s", prev_kernel, curr_kernel)
+        
+        return (curr_kernel, prev_kernel)
+    
+    def _hwe_listed(self, prev: str, curr: str) -> bool:
+        """Whether the registry lists an HWE tag of either release (True if it cannot tell)."""
+        try:
+            listed = self.get_repo_tags([img for img, _ in self.get_images(curr + "-hwe")])
+        except ChangelogError:
+            return True
+        return any(tag + "-hwe" in tags for tags in listed.values() for tag in (prev, curr))
+    
+    def recorded_pkgrel_values(self, prev: str, curr: str) -> Optional[Dict[str, str]]:
+        """The ``{pkgrel:...}`` values of two releases from the package history alone.
+        
+        None unless every image of both releases is recorded; HWE kernels
+        show as N/A when their images are not.
+        """
+        versions = self.recorded_versions(curr)
+        prev_versions = self.recorded_versions(prev)
+        if versions is None or prev_versions is None:
+            return None
+        hwe = self.recorded_versions(curr + "-hwe") or {}
+        prev_hwe = self.recorded_versions(prev + "-hwe") or {}
+        return self._pkgrel_values(self.changelog_template.packages, hwe.get("kernel"), prev_hwe.get("kernel"),
+                                   versions, prev_versions)
+    
+    def _generate_pretty_version(self, manifests: Dict[str, ImageManifest], curr: str) -> str:
+        """Generate a pretty version string if not provided."""
+        try:
+            finish = self._get_commit_hash(manifests)
+        except Exception as e:
+            logger.error(f"Failed to get finish hash: {e}")
+            finish = ""
+            
+        try:
+            linux = next(iter(manifests.values())).labels["ostree.linux"]
+            start = linux.find(".el") + 3
+            fedora_version = linux[start:start+2]
+        except Exception as e:
+            logger.error(f"Failed to get linux version: {e}")
+            fedora_version = ""
+        
+        # Remove .0 from curr and target prefix
+        curr_pretty = re.sub(r"\.\d{1,2}$", "", curr)
+        curr_pretty = re.sub(r"^[a-z]+.|^[0-9]+\.", "", curr_pretty)
+        
+        pretty = curr_pretty + " (c" + fedora_version + "s"
+        if finish:
+            pretty += ", #" + finish[:7]
+        pretty += ")"
+        
+        return pretty
+
+    def _pkgrel_values(self, packages: List[str],
+                       hwe_kernel_version: Optional[str],
+                       hwe_prev_kernel_version: Optional[str],
+                       versions: Dict[str, str],
+                       prev_versions: Dict[str, str]) -> Dict[str, str]:
+        """Compute the ``{pkgrel:<pkg>}`` values for the given package names."""
+        templates = self.config.templates
+        values = {}
+        for pkg in packages:
+            if pkg == "kernel-hwe":
+                # Handle HWE kernel version
+                if hwe_kernel_version == hwe_prev_kernel_version:
+                    value = templates.pattern_pkgrel.format(version=hwe_kernel_version or "N/A")
+                else:
+                    value = templates.pattern_pkgrel_changed.format(
+                        prev=hwe_prev_kernel_version or "N/A",
+                        new=hwe_kernel_version or "N/A"
+                    )
+            elif pkg not in versions:
+                continue
+            elif pkg not in prev_versions or prev_versions[pkg] == versions[pkg]:
+                value = templates.pattern_pkgrel.format(version=versions[pkg])
+            else:
+                value = templates.pattern_pkgrel_changed.format(
+                    prev=prev_versions[pkg], new=versions[pkg]
+                )
+            values[f"pkgrel:{pkg}"] = value
+        return values
+
+    def _section_entries(self, target: str, common: List[str], others: Dict[str, List[str]],
+                         prev_versions: Dict[str, str], versions: Dict[str, str],
+                         diff: Optional[PackageDiff] = None) -> List[Dict[str, Any]]:
+        """The package changes of every section, common packages first."""
+        # others["all"] holds the common packages minus themselves, so it is always empty
+        groups = [("all", common)] + [(key, pkgs) for key, pkgs in others.items() if key != "all"]
+        with tracer.span("package diff", target=target):
+            return [
+                {"id": key, "title": self.config.sections[key],
+                 **self._change_entries(pkgs, prev_versions, versions, diff)}
+                for key, pkgs in groups
+            ]
+    
+    def _render_changes(self, sections: List[Dict[str, Any]], commits: List[Dict[str, str]]) -> List[str]:
+        """Render the package sections and commits of a ``ReleaseDiff``; empty sections are left out."""
+        template = self.config.templates.common_pattern
+        chunks = []
+        for section in sections:
+            chunks += template.wrap(list(self._render_change_rows(section)), title=section["title"])
+        chunks += self._render_commits(commits)
+        return chunks
+
+    def generate_changelog(self, handwritten: Optional[str], target: str,
+                          pretty: Optional[str], workdir: Optional[str],
+                          prev_manifests: Dict[str, ImageManifest], 
+                          manifests: Dict[str, ImageManifest], 
+                          previous_tag: Optional[str] = None) -> Tuple[str, str]:
+        """Generate the complete changelog."""
+        title, chunks = self.render_changelog(handwritten, target, pretty, workdir,
+                                              prev_manifests, manifests, previous_tag)
+        return title, "".join(chunks)
+    
+    def render_changelog(self, handwritten: Optional[str], target: str,
+                         pretty: Optional[str], workdir: Optional[str],
+                         prev_manifests: Dict[str, ImageManifest],
+                         manifests: Dict[str, ImageManifest],
+                         previous_tag: Optional[str] = None,
+                         current_tag: Optional[str] = None) -> Tuple[str, List[str]]:
+        """Generate the changelog title and body, the body as a list of chunks.
+        
+        The chunks can be written out one by one (see ``write_chunks``)
+        without ever joining the whole changelog into a single string.
+        Passing both ``previous_tag`` and ``current_tag`` skips tag discovery,
+        which is how past releases are rendered.
+        """
+        diff = self.build_release_diff(target, pretty, workdir, prev_manifests, manifests,
+                                       previous_tag, current_tag)
+        return self.render_release(diff, handwritten)
+    
+    @staticmethod
+    def _digests_key(kind: str, *parts: Any) -> Optional[str]:
+        """Cache key for a result derived from the given parts, or None if a digest is unknown.
+        
+        Digest maps among ``parts`` must name a digest for every image.
+        """
+        for part in parts:
+            if isinstance(part, dict) and not all(part.values()):
+                return None
+        material = json.dumps(parts, sort_keys=True).encode("utf-8")
+        return f"{kind}:{hashlib.sha256(material).hexdigest()}"
+    
+    def _release_diff_key(self, target: str, workdir: Optional[str],
+                          prev_manifests: Dict[str, ImageManifest], manifests: Dict[str, ImageManifest],
+                          prev: str, curr: str) -> Optional[str]:
+        return self._digests_key("diff", self._diff_config_hash, target, prev, curr,
+                                 os.path.abspath(workdir) if workdir else None,
+                                 _manifest_digests(prev_manifests), _manifest_digests(manifests))
+    
+    def cached_release_diff(self, target: str, workdir: Optional[str],
+                            prev_manifests: Dict[str, ImageManifest], manifests: Dict[str, ImageManifest],
+                            prev: str, curr: str) -> Optional[ReleaseDiff]:
+        """The diff stored by an earlier run for the same images, tags and configuration, if any."""
+        key = self._release_diff_key(target, workdir, prev_manifests, manifests, prev, curr)
+        if not key or not self._store:
+            return None
+        cached = self._store.get_digest(key)
+        if cached is None:
+            return None
+        try:
+            diff = ReleaseDiff.from_dict(json.loads(cached))
+        except (ValueError, ChangelogError) as e:
+            logger.debug("Ignoring cached release diff %s: %s", key, e)
+            return None
+        logger.info(f"Using cached release diff for {prev} -> {curr}")
+        tracer.count("cache_hits")
+        return diff
+    
+    def release_diff(self, target: str, workdir: Optional[str],
+                     prev_manifests: Dict[str, ImageManifest], manifests: Dict[str, ImageManifest],
+                     prev: str, curr: str,
+                     commits: Optional[List[Dict[str, str]]] = None) -> ReleaseDiff:
+        """The diff of two releases, from the on-disk cache or built and then stored there.
+        
+        The pretty version is always derived from the manifests, so that
+        callers can override it per render without invalidating the cache.
+        """
+        diff = self.cached_release_diff(target, workdir, prev_manifests, manifests, prev, curr)
+        if diff is None:
+            diff = self.build_release_diff(target, None, workdir, prev_manifests, manifests, prev, curr, commits)
+            self.store_release_diff(target, workdir, prev_manifests, manifests, diff)
+        return diff
+    
+    def store_release_diff(self, target: str, workdir: Optional[str],
+                           prev_manifests: Dict[str, ImageManifest], manifests: Dict[str, ImageManifest],
+                           diff: ReleaseDiff) -> None:
+        """Store a diff built from the given manifests for ``cached_release_diff``.
+        
+        Incomplete diffs are not stored, so that the next run looks the
+        missing HWE kernels and commits up again.
+        """
+        if not diff.complete:
+            logger.info(f"Not caching the release diff for {diff.prev} -> {diff.curr}: it is incomplete")
+            return
+        key = self._release_diff_key(target, workdir, prev_manifests, manifests, diff.prev, diff.curr)
+        if key and self._store:
+            self._store.put_blob(key, json.dumps(diff.to_dict()).encode("utf-8"))
+    
+    def build_release_diff(self, target: str, pretty: Optional[str], workdir: Optional[str],
+                           prev_manifests: Dict[str, ImageManifest],
+                           manifests: Dict[str, ImageManifest],
+                           previous_tag: Optional[str] = None,
+                           current_tag: Optional[str] = None,
+                           commits: Optional[List[Dict[str, str]]] = None) -> ReleaseDiff:
+        """Collect everything the changelog of a release shows (see ``render_release``).
+        
+        ``commits`` may be passed in when ``collect_commits`` already ran
+        for the same manifests, e.g. concurrently with the registry fetches;
+        if that failed (None), they are looked up once more here.
+        """
+        logger.info(f"Generating changelog for target '{target}'")
+        
+        try:
+            # Get package data: one membership matrix and diff, projected into sections
+            with tracer.span("get_package_groups", target=target):
+                versions = self.get_versions(manifests)
+                prev_versions = self.get_versions(prev_manifests)
+                diff = self.get_package_diff(target, prev_manifests, manifests, prev_versions, versions)
+                common, others = self._project_groups(target, diff)
+            
+            # Get tags and versions
+            if previous_tag and current_tag:
+                prev, curr = previous_tag, current_tag
+            else:
+                prev, curr = self.get_tags(target, manifests, previous_tag)
+            logger.info(f"Tags: {prev} -> {curr}")
+            
+            # A diff missing the HWE kernels or commits is shown but not cached
+            complete = True
+            try:
+                hwe_kernel_version, hwe_prev_kernel_version = self._hwe_kernel_change(prev, curr)
+            except Exception as e:
+                logger.error(f"Failed to get HWE kernel versions: {e}")
+                hwe_kernel_version = hwe_prev_kernel_version = None
+                # Releases without HWE images have nothing left to look up
+                complete = not self._hwe_listed(prev, curr)
+            
+            if commits is None:
+                commits = self.collect_commits(prev_manifests, manifests, target, workdir)
+            if commits is None:
+                commits = []
+                complete = False
+            
+            if not pretty:
+                pretty = self._generate_pretty_version(manifests, curr)
+            
+            major_packages = {}
+            for pkg in dict.fromkeys(["kernel", *self.changelog_template.packages]):
+                if pkg != "kernel-hwe" and (pkg in versions or pkg in prev_versions):
+                    major_packages[pkg] = {"prev": prev_versions.get(pkg), "curr": versions.get(pkg)}
+            
+            return ReleaseDiff(
+                target=target,
+                prev=prev,
+                curr=curr,
+                pretty=pretty,
+                os=self.config.os_name,
+                images={
+                    img: {"prev": prev_manifests[img].digest if img in prev_manifests else None,
+                          "curr": manifests[img].digest if img in manifests else None}
+                    for img, _ in self.get_images(target)
+                    if img in prev_manifests or img in manifests
+                },
+                commit={"prev": self._get_commit_hash(prev_manifests),
+                        "curr": self._get_commit_hash(manifests)},
+                major_packages=major_packages,
+                hwe_kernel={"prev": hwe_prev_kernel_version, "curr": hwe_kernel_version},
+                sections=self._section_entries(target, common, others, prev_versions, versions, diff),
+                commits=commits,
+                complete=complete,
+            )
+            
+        except Exception as e:
+            logger.error(f"Failed to generate changelog: {e}")
+            raise ChangelogError(f"Changelog generation failed: {e}") from e
+    
+    def render_release(self, release: ReleaseDiff,
+                       handwritten: Optional[str] = None) -> Tuple[str, List[str]]:
+        """Render the title and Markdown body (as chunks) of a release diff; nothing is fetched."""
+        try:
+            # Generate title
+            version = release.target.capitalize()
+            if release.target in self.config.targets:
+                version = version.upper()
+                
+            title = self.config.templates.changelog_title.format_map(
+                defaultdict(str, os=self.config.os_name, tag=version, pretty=release.pretty)
+            )
+            
+            # Render the compiled template in a single pass
+            versions = {pkg: v["curr"] for pkg, v in release.major_packages.items() if v["curr"] is not None}
+            prev_versions = {pkg: v["prev"] for pkg, v in release.major_packages.items() if v["prev"] is not None}
+            fields = self._pkgrel_values(
+                self.changelog_template.packages,
+                release.hwe_kernel.get("curr"), release.hwe_kernel.get("prev"),
+                versions, prev_versions
+            )
+            fields.update(
+                handwritten=handwritten if handwritten else self.config.templates.handwritten_placeholder.format(curr=release.curr),
+                target=release.target,
+                prev=release.prev,
+                curr=release.curr,
+            )
+            
+            # Generate and insert changes section
+            changes = self._render_changes(release.sections, release.commits)
+            with tracer.span("render template", target=release.target):
+                chunks = self.changelog_template.render(fields, changes)
+            
+            logger.info("Changelog generated successfully")
+            return title, chunks
+            
+        except Exception as e:
+            logger.error(f"Failed to render changelog: {e}")
+            raise ChangelogError(f"Changelog rendering failed: {e}") from e
+
+
+def setup_argument_parser() -> argparse.ArgumentParser:
+    """Set up the command line argument parser."""
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Generate changelogs for Bluefin LTS container images",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Simple usage
+  %(prog)s lts
+  
+  # CI/CD usage (recommended for GitHub Actions)
+  %(prog)s lts --ci
+  
+  # With custom options
+  %(prog)s lts --workdir /path/to/git/repo --verbose
+  %(prog)s lts --pretty "Custom Version" --handwritten notes.txt
+  
+  # Batch mode: several targets sharing one set of registry fetches
+  %(prog)s lts dx gdx --ci
+  %(prog)s --all-targets --ci
+  
+  # Regenerate the changelogs of a range of past releases
+  %(prog)s lts --backfill lts.20250801..lts.20251001 --workdir .
+  
+  # Re-render a changelog from its saved diff, without fetching anything
+  %(prog)s --from-diff changelog.json --handwritten notes.txt
+  
+  # Keep running and write changelogs as soon as new images are tagged
+  %(prog)s lts dx gdx --ci --watch --watch-interval 120
+  
+  # Ask the package history database (defaults.history_db) instead of the registry
+  %(prog)s query history mesa-filesystem --target lts
+  %(prog)s query --help
+  
+  # Find out where the time goes (open the trace in chrome://tracing)
+  %(prog)s lts --dry-run --profile trace.json
+        """
+    )
+    
+    # Targets
+    parser.add_argument("targets", nargs="*", metavar="target",
+                       help="Target tag(s) to generate changelogs for")
+    parser.add_argument("--all-targets", action="store_true",
+                       help="Generate changelogs for every target listed in the configuration")
+    
+    # Optional arguments
+    parser.add_argument("--pretty", help="Custom subject for the changelog")
+    parser.add_argument("--workdir", help="Git directory for commit extraction")
+    parser.add_argument("--handwritten", help="Path to handwritten changelog content")
+    parser.add_argument("--previous-tag", help="Previous tag to compare against (overrides automatic detection)")
+    
+    # Output control
+    parser.add_argument("--verbose", "-v", action="store_true",
+                       help="Enable verbose logging")
+    parser.add_argument("--dry-run", action="store_true",
+                       help="Generate changelog but don't write files")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Do not read or write the on-disk manifest cache")
+    parser.add_argument("--profile", nargs="?", const="changelog-trace.json", metavar="TRACE",
+                       help="Record stage and external call timings and write them as a Chrome trace "
+                            "(default file: %(const)s)")
+    
+    # Release management options
+    parser.add_argument("--check-release", action="store_true",
+                       help="Check if release already exists before generating changelog")
+    parser.add_argument("--force", action="store_true",
+                       help="Generate changelog even if release already exists")
+    parser.add_argument("--github-output", 
+                       help="Path to GitHub Actions output file for setting variables")
+    parser.add_argument("--ci", action="store_true",
+                       help="Enable CI/CD mode (equivalent to --check-release --workdir . --github-output $GITHUB_OUTPUT)")
+    
+    # Historical backfill
+    parser.add_argument("--backfill", metavar="FROM..TO",
+                       help="Generate a changelog for every release after FROM up to and including TO")
+    parser.add_argument("--backfill-dir", default="changelogs",
+                       help="Directory for backfilled changelogs and resume state (default: %(default)s)")
+    
+    # Re-rendering
+    parser.add_argument("--from-diff", metavar="FILE",
+                       help="Render changelogs from a saved release diff (JSON or NDJSON) instead of "
+                            "fetching manifests; targets, if given, select records")
+    
+    # Long-running mode
+    parser.add_argument("--watch", action="store_true",
+                       help="Keep running, polling the registry and generating changelogs when targets get new images")
+    parser.add_argument("--watch-interval", type=float, metavar="SECONDS",
+                       help="Seconds between polls in --watch mode (default: defaults.watch_interval)")
+    parser.add_argument("--max-polls", type=int, default=0, metavar="N",
+                       help="Stop --watch after N polls (default: run until interrupted)")
+    
+    return parser
+
+
+def validate_arguments(args: argparse.Namespace) -> None:
+    """Validate command line arguments."""
+    if args.from_diff:
+        if args.backfill or args.previous_tag or args.check_release:
+            raise ValueError("--from-diff cannot be combined with --backfill, --previous-tag or --check-release")
+        if not Path(args.from_diff).is_file():
+            raise ValueError(f"Release diff file not found: {args.from_diff}")
+    elif not args.targets and not args.all_targets:
+        raise ValueError("No target given (pass one or more targets or --all-targets)")
+    
+    if args.watch:
+        if args.backfill or args.from_diff or args.previous_tag:
+            raise ValueError("--watch cannot be combined with --backfill, --from-diff or --previous-tag")
+        if args.watch_interval is not None and args.watch_interval <= 0:
+            raise ValueError("--watch-interval must be positive")
+        if args.max_polls < 0:
+            raise ValueError("--max-polls must not be negative")
+    elif args.watch_interval is not None or args.max_polls:
+        raise ValueError("--watch-interval and --max-polls require --watch")
+    
+    if args.previous_tag and (len(args.targets) > 1 or args.all_targets):
+        raise ValueError("--previous-tag can only be used with a single target")
+    
+    if args.backfill:
+        if len(args.targets) != 1 or args.all_targets:
+            raise ValueError("--backfill requires exactly one target")
+        if args.previous_tag:
+            raise ValueError("--backfill cannot be combined with --previous-tag")
+        start, separator, end = args.backfill.partition("..")
+        if not separator or not start or not end:
+            raise ValueError(f"Invalid --backfill range '{args.backfill}', expected FROM..TO")
+    
+    # Validate workdir if provided
+    if args.workdir and not Path(args.workdir).is_dir():
+        raise ValueError(f"Workdir does not exist or is not a directory: {args.workdir}")
+    
+    # Validate handwritten content if provided
+    if args.handwritten:
+        handwritten_path = Path(args.handwritten)
+        if not handwritten_path.exists():
+            raise ValueError(f"Handwritten changelog file not found: {args.handwritten}")
+
+
+class Pipeline:
+    """A small graph of stages, each started as soon as the stages it depends on are done.
+    
+    A stage is called with the results of its dependencies, in order, and
+    may return ``Pipeline.SKIP`` to skip every stage depending on it.
+    Stages depending on a stage that raised are skipped too. Each stage is
+    traced as a span named after its name up to the first colon, so
+    ``manifests:lts`` and ``manifests:dx`` add up.
+    """
+    
+    SKIP = object()
+    
+    def __init__(self, max_workers: int = 32):
+        self.max_workers = max_workers
+        self._stages: Dict[str, Tuple[Callable[..., Any], Tuple[str, ...]]] = {}
+    
+    def add(self, name: str, fn: Callable[..., Any], deps: Iterable[str] = ()) -> None:
+        """Add a stage; its dependencies must have been added before it."""
+        deps = tuple(deps)
+        unknown = [dep for dep in deps if dep not in self._stages]
+        if unknown:
+            raise ValueError(f"Stage {name} depends on unknown stages: {', '.join(unknown)}")
+        self._stages[name] = (fn, deps)
+    
+    def _call(self, name: str, fn: Callable[..., Any], inputs: List[Any]) -> Any:
+        with tracer.span(name.partition(":")[0], stage=name):
+            return fn(*inputs)
+    
+    def run(self) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+        """Run every stage and return the results and the errors, by stage name.
+        
+        Skipped stages appear in neither.
+        """
+        results: Dict[str, Any] = {}
+        errors: Dict[str, Exception] = {}
+        skipped: Set[str] = set()
+        pending = dict(self._stages)
+        running: Dict[Any, str] = {}
+        workers = max(1, min(self.max_workers, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stage") as pool:
+            while pending or running:
+                # Stages are in dependency order, so one pass settles every stage that can be
+                for name, (fn, deps) in list(pending.items()):
+                    if any(dep in errors or dep in skipped for dep in deps):
+                        del pending[name]
+                        skipped.add(name)
+                    elif all(dep in results for dep in deps):
+                        del pending[name]
+                        running[pool.submit(self._call, name, fn, [results[dep] for dep in deps])] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        errors[name] = e
+                        continue
+                    if result is Pipeline.SKIP:
+                        skipped.add(name)
+                    else:
+                        results[name] = result
+        return results, errors
+
+
+@dataclass
+class TargetRun:
+    """State of one target while a (possibly batched) run progresses."""
+    target: str
+    manifests: Dict[str, ImageManifest]
+    prev: str
+    curr: str
+    title: str = ""
+    chunks: Optional[List[str]] = None
+    diff: Optional[ReleaseDiff] = None
+    
+    def diff_record(self) -> Dict[str, Any]:
+        """The release diff as written to the JSON artifact, with the rendered title."""
+        return dict(self.diff.to_dict(), title=self.title)
+
+
+def target_output_paths(config: Config, target: str, batch: bool) -> Tuple[Path, Path, Optional[Path]]:
+    """Changelog, env and diff file paths; batch runs get one set per target.
+    
+    The diff path is None when no diff artifact is configured. An
+    ``.ndjson`` diff file is shared by all targets, one line each.
+    """
+    changelog_path = Path(config.defaults.output_file)
+    output_path = Path(config.defaults.env_output_file)
+    diff_path = Path(config.defaults.diff_output_file) if config.defaults.diff_output_file else None
+    if batch:
+        changelog_path = changelog_path.with_name(f"{changelog_path.stem}-{target}{changelog_path.suffix}")
+        output_path = output_path.with_name(f"{output_path.stem}-{target}{output_path.suffix}")
+        if diff_path and diff_path.suffix != ".ndjson":
+            diff_path = diff_path.with_name(f"{diff_path.stem}-{target}{diff_path.suffix}")
+    return changelog_path, output_path, diff_path
+
+
+def target_output_variables(variables: Dict[str, str], target: str, batch: bool) -> Dict[str, str]:
+    """GitHub output variables; batch runs suffix each name with the target."""
+    if not batch:
+        return variables
+    suffix = re.sub(r"\W", "_", target.upper())
+    return {f"{key}_{suffix}": value for key, value in variables.items()}
+
+
+def prepare_target(generator: ChangelogGenerator, target: str, args: argparse.Namespace,
+                   manifests: Dict[str, ImageManifest], existing: Dict[str, str]) -> Optional[TargetRun]:
+    """Resolve the tags of a target, or record its tag in ``existing`` if its release already exists."""
+    # Determine previous tag - use provided one or auto-detect
+    prev, curr = generator.get_tags(target, manifests, args.previous_tag)
+    logger.info(f"Current tag: {curr}")
+    
+    # Check if release already exists (if requested)
+    if args.check_release and not args.force:
+        if generator.releases.exists(curr):
+            logger.info(f"Release already exists for tag {curr}. Skipping changelog generation.")
+            existing[target] = curr
+            return None
+        else:
+            logger.info(f"No existing release found for {curr}. Generating changelog.")
+    
+    # Use last published release as previous tag if not specified and check-release is enabled
+    if args.check_release and not args.previous_tag:
+        last_published = generator.releases.latest()
+        if last_published:
+            prev = last_published
+            logger.info(f"Using last published release as previous tag: {prev}")
+    
+    return TargetRun(target, manifests, prev, curr)
+
+
+def cached_target_diff(generator: ChangelogGenerator, run: TargetRun,
+                       args: argparse.Namespace) -> Optional[ReleaseDiff]:
+    """The release diff of a prepared target stored by an earlier run, if any."""
+    prev_manifests = generator.cached_manifests(run.prev)
+    if not prev_manifests:
+        return None
+    prev, curr = generator.get_tags(run.target, run.manifests, args.previous_tag)
+    return generator.cached_release_diff(run.target, args.workdir, prev_manifests, run.manifests, prev, curr)
+
+
+def render_target(generator: ChangelogGenerator, run: TargetRun, args: argparse.Namespace,
+                  handwritten: Optional[str], commits: Optional[List[Dict[str, str]]] = None) -> TargetRun:
+    """Render the changelog of a prepared target, building its diff unless it is cached."""
+    with tracer.span("render_target", target=run.target):
+        if run.diff is None:
+            prev_manifests = generator.get_manifests(run.prev)
+            # The tags shown are the discovered ones, even when diffing against the last published release
+            prev, curr = generator.get_tags(run.target, run.manifests, args.previous_tag)
+            run.diff = generator.release_diff(run.target, args.workdir, prev_manifests, run.manifests,
+                                              prev, curr, commits)
+        if args.pretty:
+            run.diff.pretty = args.pretty
+        run.title, run.chunks = generator.render_release(run.diff, handwritten)
+    return run
+
+
+def write_target_outputs(config: Config, run: TargetRun, args: argparse.Namespace, batch: bool) -> None:
+    """Write the changelog, env file and GitHub outputs of a rendered target."""
+    if not args.verbose:
+        print(f"Changelog Title: {run.title}")
+        print(f"Tag: {run.curr}")
+    
+    # Write output files unless dry-run
+    if args.dry_run:
+        logger.info("Dry run - no files written")
+        return
+        
+    # Files whose content did not change are left alone
+    changelog_path, output_path, diff_path = target_output_paths(config, run.target, batch)
+    if write_if_changed(changelog_path, run.chunks):
+        logger.info(f"Changelog written to {changelog_path}")
+    
+    output_content = f'TITLE="{run.title}"\nTAG={run.curr}\n'
+    if write_if_changed(output_path, [output_content]):
+        logger.info(f"Environment variables written to {output_path}")
+    
+    # NDJSON diffs hold every target and are written once all are rendered
+    if diff_path and diff_path.suffix != ".ndjson" and run.diff is not None:
+        if write_release_diffs(diff_path, [run.diff_record()]):
+            logger.info(f"Release diff written to {diff_path}")
+    
+    # Write GitHub Actions output if requested
+    if args.github_output:
+        variables = {
+            "SKIP_CHANGELOG": "false",
+            "CHANGELOG_TAG": run.curr,
+            "CHANGELOG_TITLE": run.title,
+            "CHANGELOG_PATH": str(changelog_path.absolute()),
+            "EXISTING_RELEASE": "false"
+        }
+        if diff_path:
+            variables["CHANGELOG_JSON"] = str(diff_path.absolute())
+        # Re-rendering an unchanged release adds nothing to the output file
+        variables = changed_github_output(args.github_output, target_output_variables(variables, run.target, batch))
+        if variables:
+            write_github_output(args.github_output, variables)
+        else:
+            logger.info(f"GitHub output unchanged: {args.github_output}")
+
+
+def generate_targets(generator: ChangelogGenerator, targets: List[str],
+                     args: argparse.Namespace, handwritten: Optional[str],
+                     batch: Optional[bool] = None) -> None:
+    """Generate changelogs for one or more targets.
+    
+    Each target is a chain of ``Pipeline`` stages: current manifests, tags,
+    previous manifests, then the HWE manifests and the commits (both only
+    for diffs not cached by an earlier run) side by side, then rendering.
+    Recording the current release in the package history runs alongside.
+    The GitHub release list is fetched alongside, and with
+    ``--check-release`` the newest tag of the base image alone is checked
+    first, so an existing release is found before any manifest is
+    fetched. Outputs are written in target order once all stages are done.
+    In batch mode (several targets, unless ``batch`` says otherwise) a
+    failing target does not stop the others; the run still fails at the end.
+    """
+    if batch is None:
+        batch = len(targets) > 1
+    check = args.check_release and not args.force
+    pipeline = Pipeline()
+    stages: Dict[str, List[str]] = {}
+    existing: Dict[str, str] = {}
+    failures: Dict[str, Exception] = {}
+    written: List[TargetRun] = []
+    
+    if args.check_release:
+        pipeline.add("releases", generator.releases.releases)
+    
+    def add_target(target: str) -> None:
+        names = stages[target] = ["releases"] if args.check_release else []
+        
+        def stage(kind: str, fn: Callable[..., Any], *deps: str) -> None:
+            names.append(f"{kind}:{target}")
+            pipeline.add(names[-1], fn, deps)
+        
+        def check_release(_releases: Any) -> Any:
+            # A tag is only final once every variant has it, but if the newest
+            # base image tag is released already there is nothing to do
+            base = generator.get_images(target)[0][0]
+            candidate = generator.get_tag_index(target, [base]).latest()
+            if candidate and generator.releases.exists(candidate):
+                logger.info(f"Release already exists for tag {candidate}. Skipping changelog generation.")
+                existing[target] = candidate
+                return Pipeline.SKIP
+            return None
+        
+        def current(*_: Any) -> Dict[str, ImageManifest]:
+            logger.info(f"Fetching current manifests for {target}...")
+            generator.prefetch_manifests([target])
+            return generator.get_manifests(target)
+        
+        def tags(manifests: Dict[str, ImageManifest], *_: Any) -> Any:
+            run = prepare_target(generator, target, args, manifests, existing)
+            return Pipeline.SKIP if run is None else run
+        
+        def previous(run: TargetRun) -> TargetRun:
+            logger.info(f"Fetching previous manifests for {target}...")
+            generator.prefetch_manifests([run.prev])
+            run.diff = cached_target_diff(generator, run, args)
+            return run
+        
+        def hwe(run: TargetRun) -> None:
+            # Pull the HWE manifests needed later by build_release_diff, which
+            # diffs the discovered tags even against the last published release
+            if run.diff is None:
+                generator.prefetch_hwe(list(generator.get_tags(target, run.manifests, args.previous_tag)))
+        
+        def commits(run: TargetRun) -> Optional[List[Dict[str, str]]]:
+            if run.diff is not None:
+                return None
+            return generator.collect_commits(generator.get_manifests(run.prev), run.manifests,
+                                             target, args.workdir)
+        
+        def history(run: TargetRun) -> None:
+            generator.record_release(run.curr, run.manifests)
+        
+        def render(run: TargetRun, _hwe: None, entries: Optional[List[Dict[str, str]]]) -> TargetRun:
+            logger.info(f"Generating changelog for {target}...")
+            return render_target(generator, run, args, handwritten, entries)
+        
+        if check:
+            stage("check_release", check_release, "releases")
+        stage("manifests", current, *([f"check_release:{target}"] if check else []))
+        stage("tags", tags, f"manifests:{target}", *(["releases"] if args.check_release else []))
+        stage("previous", previous, f"tags:{target}")
+        stage("history", history, f"tags:{target}")
+        stage("hwe", hwe, f"previous:{target}")
+        stage("commits", commits, f"previous:{target}")
+        stage("render", render, f"previous:{target}", f"hwe:{target}", f"commits:{target}")
+    
+    for target in targets:
+        add_target(target)
+    results, errors = pipeline.run()
+    
+    for target in targets:
+        error = next((errors[name] for name in stages[target] if name in errors), None)
+        if error is not None:
+            if not batch or not isinstance(error, ChangelogError):
+                raise error
+            logger.error(f"Changelog generation failed for {target}: {error}")
+            failures[target] = error
+        elif target in existing:
+            if args.github_output:
+                write_github_output(args.github_output, target_output_variables({
+                    "SKIP_CHANGELOG": "true",
+                    "CHANGELOG_TAG": existing[target],
+                    "EXISTING_RELEASE": "true"
+                }, target, batch))
+        else:
+            run = results[f"render:{target}"]
+            with tracer.span("write_target_outputs", target=target):
+                write_target_outputs(generator.config, run, args, batch)
+            written.append(run)
+    
+    diff_file = generator.config.defaults.diff_output_file
+    if diff_file.endswith(".ndjson") and written and not args.dry_run:
+        if write_release_diffs(Path(diff_file), [run.diff_record() for run in written]):
+            logger.info(f"Release diffs written to {diff_file}")
+    
+    if failures:
+        raise ChangelogError(f"Failed targets: {', '.join(failures)}")
+
+
+def _render_backfill_release(config: Config, target: str, prev: str, curr: str,
+                             manifests_by_ref: Dict[str, Optional[Dict[str, ImageManifest]]],
+                             pretty: Optional[str], workdir: Optional[str],
+                             handwritten: Optional[str]) -> Tuple[str, str, ReleaseDiff]:
+    """Process pool worker: render one backfilled release from pre-fetched manifests.
+    
+    The returned diff keeps the derived pretty version, so it can be cached.
+    """
+    generator = ChangelogGenerator(config, use_cache=False)
+    generator.preload_manifests(manifests_by_ref)
+    diff = generator.build_release_diff(
+        target, None, workdir,
+        manifests_by_ref[prev], manifests_by_ref[curr],
+        previous_tag=prev, current_tag=curr
+    )
+    title, chunks = generator.render_release(replace(diff, pretty=pretty) if pretty else diff, handwritten)
+    return title, "".join(chunks), diff
+
+
+def _write_backfill_state(path: Path, tag_range: str, completed: Set[str],
+                          failures: Dict[str, str]) -> None:
+    """Record backfill progress so that an interrupted run can resume."""
+    path.write_text(json.dumps({
+        "range": tag_range,
+        "completed": sorted(completed, key=TagIndex.sort_key),
+        "failed": failures,
+    }, indent=2), encoding="utf-8")
+
+
+def run_backfill(generator: ChangelogGenerator, target: str, args: argparse.Namespace,
+                 handwritten: Optional[str]) -> None:
+    """Generate one changelog per release in a tag range.
+    
+    Every tag in the range is fetched exactly once, then each adjacent
+    pair is diffed and rendered in a process pool; pairs whose diff is
+    cached from an earlier run are only re-rendered. Completed releases are
+    recorded in a state file inside the output directory, so re-running
+    after a failure only renders what is still missing. With a diff
+    artifact configured, each release also gets a ``<tag>.json`` diff and
+    ``releases.ndjson`` collects all of them in tag order.
+    """
+    start, _, end = args.backfill.partition("..")
+    images = [img for img, _ in generator.get_images(target)]
+    releases = generator.get_tag_index(target, images).between(start, end)
+    if not releases:
+        raise TagDiscoveryError(f"No '{target}' releases found after {start} up to {end}")
+    pairs = list(zip([start] + releases[:-1], releases))
+    
+    out_dir = Path(args.backfill_dir)
+    state_path = out_dir / ".backfill-state.json"
+    try:
+        completed = set(json.loads(state_path.read_text(encoding="utf-8")).get("completed", []))
+    except (FileNotFoundError, json.JSONDecodeError):
+        completed = set()
+    if args.force:
+        completed.clear()
+    pending = [(prev, curr) for prev, curr in pairs if curr not in completed]
+    logger.info(f"Backfilling {len(pending)} of {len(pairs)} releases from {start} to {end}")
+    if not pending:
+        return
+    
+    # Fetch every tag once for the whole range, and the HWE counterparts
+    # of the pairs that have to be diffed
+    refs = list(dict.fromkeys(tag for pair in pending for tag in pair))
+    generator.prefetch_manifests(refs)
+    failures: Dict[str, str] = {}
+    cached: Dict[str, ReleaseDiff] = {}
+    for prev, curr in pending:
+        prev_manifests, manifests = generator.cached_manifests(prev), generator.cached_manifests(curr)
+        if not prev_manifests or not manifests:
+            failures[curr] = "manifests could not be fetched"
+            logger.error(f"Skipping {curr}: manifests for {prev} or {curr} could not be fetched")
+            continue
+        diff = generator.cached_release_diff(target, args.workdir, prev_manifests, manifests, prev, curr)
+        if diff is not None:
+            cached[curr] = diff
+    generator.prefetch_hwe([
+        ref for prev, curr in pending if curr not in cached and curr not in failures
+        for ref in (prev, curr)
+    ])
+    
+    def finish(done: int, total: int, prev: str, curr: str, title: str, changelog: str,
+               diff: ReleaseDiff) -> None:
+        logger.info(f"[{done}/{total}] {prev} -> {curr}: {title}")
+        if args.dry_run:
+            return
+        out_dir.mkdir(parents=True, exist_ok=True)
+        write_if_changed(out_dir / f"{curr}.md", [changelog])
+        write_if_changed(out_dir / f"{curr}.env", [f'TITLE="{title}"\nTAG={curr}\n'])
+        if generator.config.defaults.diff_output_file:
+            record = dict(diff.to_dict(), title=title)
+            if args.pretty:
+                record["pretty"] = args.pretty
+            write_release_diffs(out_dir / f"{curr}.json", [record])
+        completed.add(curr)
+        _write_backfill_state(state_path, args.backfill, completed, failures)
+    
+    to_render = [(prev, curr) for prev, curr in pending if curr not in failures]
+    for done, (prev, curr) in enumerate([pair for pair in to_render if pair[1] in cached], 1):
+        diff = cached[curr]
+        title, chunks = generator.render_release(
+            replace(diff, pretty=args.pretty) if args.pretty else diff, handwritten)
+        finish(done, len(to_render), prev, curr, title, "".join(chunks), diff)
+    
+    to_build = [(prev, curr) for prev, curr in to_render if curr not in cached]
+    if to_build:
+        from concurrent.futures import ProcessPoolExecutor
+        workers = generator.config.defaults.backfill_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(to_build))) as pool:
+            futures = {}
+            for prev, curr in to_build:
+                manifests_by_ref = {ref: generator.cached_manifests(ref)
+                                    for ref in (prev, curr, prev + "-hwe", curr + "-hwe")}
+                future = pool.submit(_render_backfill_release, generator.config, target, prev, curr,
+                                     manifests_by_ref, args.pretty, args.workdir, handwritten)
+                futures[future] = (prev, curr)
+            
+            for done, future in enumerate(as_completed(futures), len(cached) + 1):
+                prev, curr = futures[future]
+                try:
+                    title, changelog, diff = future.result()
+                except Exception as e:
+                    failures[curr] = str(e)
+                    logger.error(f"[{done}/{len(to_render)}] {prev} -> {curr} failed: {e}")
+                    continue
+                generator.store_release_diff(target, args.workdir, generator.cached_manifests(prev),
+                                             generator.cached_manifests(curr), diff)
+                finish(done, len(to_render), prev, curr, title, changelog, diff)
+    
+    if generator.config.defaults.diff_output_file and not args.dry_run:
+        records = []
+        for tag in sorted(completed, key=TagIndex.sort_key):
+            try:
+                records += read_release_diffs(out_dir / f"{tag}.json")
+            except (FileNotFoundError, json.JSONDecodeError):
+                logger.warning(f"No release diff for {tag}, leaving it out of releases.ndjson")
+        if records:
+            write_release_diffs(out_dir / "releases.ndjson", records)
+    
+    if failures:
+        if not args.dry_run:
+            out_dir.mkdir(parents=True, exist_ok=True)
+            _write_backfill_state(state_path, args.backfill, completed, failures)
+        raise ChangelogError(f"Backfill failed for {len(failures)} releases: {', '.join(failures)} "
+                             f"(re-run to resume)")
+
+
+def render_saved_diffs(generator: ChangelogGenerator, targets: List[str],
+                       args: argparse.Namespace, handwritten: Optional[str]) -> None:
+    """Render changelogs from a saved diff artifact; no registry, git or GitHub calls are made."""
+    try:
+        records = read_release_diffs(Path(args.from_diff))
+    except (OSError, ValueError) as e:
+        raise ChangelogError(f"Failed to read release diff {args.from_diff}: {e}") from e
+    diffs = [ReleaseDiff.from_dict(record) for record in records]
+    if targets:
+        diffs = [diff for diff in diffs if diff.target in targets]
+    if not diffs:
+        raise ChangelogError(f"No matching releases in {args.from_diff}")
+    seen = [diff.target for diff in diffs]
+    duplicates = sorted({target for target in seen if seen.count(target) > 1})
+    if duplicates:
+        raise ChangelogError(f"{args.from_diff} has several releases for {', '.join(duplicates)}; "
+                             f"select one target or render the per-release files")
+    
+    batch = len(diffs) > 1
+    for diff in diffs:
+        if args.pretty:
+            diff.pretty = args.pretty
+        title, chunks = generator.render_release(diff, handwritten)
+        run = TargetRun(diff.target, {}, diff.prev, diff.curr, title, chunks, diff)
+        write_target_outputs(generator.config, run, args, batch)
+
+
+class TagWatcher:
+    """Generates changelogs whenever the moving tag of a target moves (``--watch``).
+    
+    Each poll resolves the digest the moving tag (``lts``, ``dx``, ...) of
+    every image points at, which takes one ``HEAD`` request per image with
+    the native backend. Only targets whose digests changed since the last
+    successful generation are generated again, with ``generate_targets`` on
+    the same generator: manifests of release tags, release diffs, the tag
+    lists of other targets and commit indexes stay warm between polls.
+    """
+    
+    def __init__(self, generator: ChangelogGenerator, targets: List[str],
+                 args: argparse.Namespace, handwritten: Optional[str]):
+        self.generator = generator
+        self.targets = targets
+        self.args = args
+        self.handwritten = handwritten
+        self.digests: Dict[str, Tuple[str, ...]] = {}
+    
+    def poll(self) -> List[str]:
+        """Poll once and generate the changelogs of the targets that moved.
+        
+        Returns the targets generated. When generation fails the digests
+        are not recorded, so the targets are tried again at the next poll.
+        """
+        self.generator.renew()
+        moved: Dict[str, Tuple[str, ...]] = {}
+        with tracer.span("poll"):
+            for target in self.targets:
+                try:
+                    digests = self.generator.poll_digests(target)
+                except ChangelogError as e:
+                    logger.warning(f"Polling {target} failed: {e}")
+                    continue
+                if digests != self.digests.get(target):
+                    moved[target] = digests
+        if not moved:
+            logger.debug("No new images")
+            return []
+        
+        logger.info(f"New images for {', '.join(moved)}")
+        for target, digests in moved.items():
+            self.generator.tag_moved(target, digests)
+        try:
+            # Output names stay those of the whole watched set, however many targets moved
+            generate_targets(self.generator, list(moved), self.args, self.handwritten,
+                             batch=len(self.targets) > 1)
+        except ChangelogError as e:
+            logger.error(f"Changelog generation failed: {e}")
+            return []
+        self.digests.update(moved)
+        return list(moved)
+
+
+def run_watch(generator: ChangelogGenerator, targets: List[str], args: argparse.Namespace,
+              handwritten: Optional[str]) -> None:
+    """Poll for new images until interrupted (or ``--max-polls`` polls)."""
+    watcher = TagWatcher(generator, targets, args, handwritten)
+    interval = args.watch_interval or generator.config.defaults.watch_interval
+    logger.info(f"Watching {', '.join(targets)} every {interval:g}s")
+    polls = 0
+    while True:
+        started = time.monotonic()
+        watcher.poll()
+        polls += 1
+        if args.max_polls and polls >= args.max_polls:
+            return
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def setup_query_parser() -> argparse.ArgumentParser:
+    """Set up the parser of the ``query`` subcommand."""
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog=f"{Path(sys.argv[0]).name} query",
+        description="Answer package version questions from the package history database",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # When did a package change?
+  %(prog)s history mesa-filesystem --target lts
+  
+  # Package changes between two releases, without touching the registry
+  %(prog)s diff lts.20250801 lts.20251001
+  
+  # Versions of some packages in one release (HWE images have their own tags)
+  %(prog)s versions lts.20251001-hwe kernel
+        """
+    )
+    parser.add_argument("--db", help="History database (default: defaults.history_db)")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of text")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    history = commands.add_parser("history", help="Versions a package had over time")
+    history.add_argument("package")
+    history.add_argument("--image", help="Only this image repository")
+    history.add_argument("--target", help="Only release tags of this target")
+    history.add_argument("--all", action="store_true",
+                         help="List every recorded release, not only those where the version changed")
+    
+    diff = commands.add_parser("diff", help="Package changes between two release tags")
+    diff.add_argument("previous")
+    diff.add_argument("current")
+    diff.add_argument("--image", help="Only this image repository")
+    
+    versions = commands.add_parser("versions", help="Package versions of a release tag")
+    versions.add_argument("tag")
+    versions.add_argument("packages", nargs="*", help="Only these packages")
+    versions.add_argument("--image", help="Only this image repository")
+    return parser
+
+
+def _query_history(history: PackageHistory, config: Config, args: argparse.Namespace) -> Any:
+    pattern = None
+    if args.target:
+        pattern = config.patterns.start.get(args.target)
+        if pattern is None:
+            raise ChangelogError(f"Unknown target '{args.target}'")
+    rows = []
+    last: Dict[Tuple[str, bool], str] = {}
+    for repo, tag, version in history.history(args.package, args.image):
+        if pattern and not pattern.match(tag):
+            continue
+        # HWE images have their own tags, and their own kernel
+        series = (repo, tag.endswith("-hwe"))
+        if args.all or last.get(series) != version:
+            rows.append({"image": repo, "tag": tag, "version": version})
+        last[series] = version
+    return rows
+
+
+def _query_diff(generator: ChangelogGenerator, args: argparse.Namespace) -> Any:
+    history = generator.history
+    repos = [args.image] if args.image else [
+        repo for repo in history.repos(args.current) if repo in set(history.repos(args.previous))
+    ]
+    images = {}
+    for repo in repos:
+        prev, curr = history.versions(repo, args.previous), history.versions(repo, args.current)
+        if prev is None or curr is None:
+            raise ChangelogError(f"{repo} is not recorded for both {args.previous} and {args.current}")
+        images[repo] = {
+            "added": {name: curr[name] for name in sorted(curr.keys() - prev.keys())},
+            "changed": {name: [prev[name], curr[name]] for name in sorted(curr.keys() & prev.keys())
+                        if prev[name] != curr[name]},
+            "removed": {name: prev[name] for name in sorted(prev.keys() - curr.keys())},
+        }
+    if not images:
+        raise ChangelogError(f"No image is recorded for both {args.previous} and {args.current}")
+    major = generator.recorded_pkgrel_values(args.previous, args.current) or {}
+    return {
+        "previous": args.previous,
+        "current": args.current,
+        "major": {key.split(":", 1)[1]: value for key, value in major.items()},
+        "images": images,
+    }
+
+
+def _query_versions(history: PackageHistory, args: argparse.Namespace) -> Any:
+    images = {}
+    for repo in [args.image] if args.image else history.repos(args.tag):
+        versions = history.versions(repo, args.tag)
+        if versions is None:
+            raise ChangelogError(f"{repo}:{args.tag} is not recorded")
+        if args.packages:
+            versions = {name: versions[name] for name in args.packages if name in versions}
+        images[repo] = dict(sorted(versions.items()))
+    if not images:
+        raise ChangelogError(f"No image is recorded for {args.tag}")
+    return images
+
+
+def _print_query(command: str, result: Any) -> None:
+    if command == "history":
+        for row in result:
+            print(f"{row['image']:<20} {row['tag']:<28} {row['version']}")
+    elif command == "diff":
+        for name, value in result["major"].items():
+            print(f"{name:<36} {value}")
+        for repo, changes in result["images"].items():
+            print(f"\n{repo}: {len(changes['added'])} added, {len(changes['changed'])} changed, "
+                  f"{len(changes['removed'])} removed")
+            for name, version in changes["added"].items():
+                print(f"  + {name:<34} {version}")
+            for name, (prev, curr) in changes["changed"].items():
+                print(f"  ~ {name:<34} {prev} -> {curr}")
+            for name, version in changes["removed"].items():
+                print(f"  - {name:<34} {version}")
+    else:
+        for repo, versions in result.items():
+            for name, version in versions.items():
+                print(f"{repo:<20} {name:<36} {version}")
+
+
+def run_query(argv: List[str]) -> int:
+    """The ``query`` subcommand: package history answered from the local database."""
+    args = setup_query_parser().parse_args(argv)
+    config = load_config()
+    if not (args.db or config.defaults.history_db):
+        logger.error("No package history database configured (set defaults.history_db or pass --db)")
+        return 1
+    path = Path(args.db or config.defaults.history_db).expanduser()
+    if not path.is_file():
+        logger.error(f"Package history database not found: {path}")
+        return 1
+    config = replace(config, defaults=replace(config.defaults, history_db=str(path)))
+    generator = ChangelogGenerator(config, use_cache=False)
+    if generator.history is None:
+        return 1
+    try:
+        if args.command == "history":
+            result = _query_history(generator.history, config, args)
+        elif args.command == "diff":
+            result = _query_diff(generator, args)
+        else:
+            result = _query_versions(generator.history, args)
+    except ChangelogError as e:
+        logger.error(str(e))
+        return 1
+    finally:
+        generator.history.close()
+    
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        _print_query(args.command, result)
+    return 0
+
+
+def write_profile(trace_path: str, github_output: Optional[str]) -> None:
+    """Export the trace, log a per-stage summary and add it to the GitHub output."""
+    summary = tracer.summary()
+    try:
+        tracer.export(trace_path)
+        logger.info(f"Trace written to {trace_path}")
+    except OSError as e:
+        logger.error(f"Failed to write trace: {e}")
+    
+    for name, stats in sorted(summary["spans"].items(), key=lambda item: -item[1]["total_ms"]):
+        logger.info(f"  {name:<24} {stats['count']:>5}x {stats['total_ms']:>10.1f} ms "
+                    f"(max {stats['max_ms']:.1f} ms)")
+    for name, value in sorted(summary["counters"].items()):
+        logger.info(f"  {name:<24} {value:g}")
+    
+    if github_output:
+        write_github_output(github_output, {
+            "PROFILE_TRACE": str(Path(trace_path).absolute()),
+            "PROFILE_SUMMARY": json.dumps(summary, separators=(",", ":")),
+        })
+
+
+def main():
+    """Main entry point for the changelog generator."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    if sys.argv[1:2] == ["query"]:
+        sys.exit(run_query(sys.argv[2:]))
+    
+    parser = setup_argument_parser()
+    args = parser.parse_args()
+    
+    try:
+        # Validate arguments
+        validate_arguments(args)
+        
+        # Handle CI mode - apply common CI/CD defaults
+        if args.ci:
+            args.check_release = True
+            if not args.workdir:
+                args.workdir = "."
+            if not args.github_output and os.getenv('GITHUB_OUTPUT'):
+                args.github_output = os.getenv('GITHUB_OUTPUT')
+        
+        # Configure logging based on verbosity
+        if args.verbose:
+            logging.getLogger().setLevel(logging.DEBUG)
+        
+        if args.profile:
+            tracer.enable()
+        
+        # Create configuration with defaults
+        with tracer.span("load_config"):
+            config = load_config(use_cache=not args.no_cache)
+        
+        # Remove refs/tags, refs/heads, refs/remotes etc.
+        targets = [target.split('/')[-1] for target in args.targets]
+        if args.all_targets:
+            targets += config.targets
+        targets = list(dict.fromkeys(targets))
+        logger.info(f"Processing targets: {', '.join(targets)}")
+        
+        # Load handwritten content if provided
+        handwritten = None
+        if args.handwritten:
+            handwritten_path = Path(args.handwritten)
+            handwritten = handwritten_path.read_text(encoding='utf-8')
+            logger.info(f"Loaded handwritten content from {args.handwritten}")
+        
+        # Create generator and process
+        generator = ChangelogGenerator(config, use_cache=not args.no_cache)
+        with tracer.span("main"):
+            if args.from_diff:
+                render_saved_diffs(generator, targets, args, handwritten)
+            elif args.backfill:
+                run_backfill(generator, targets[0], args, handwritten)
+            elif args.watch:
+                run_watch(generator, targets, args, handwritten)
+            else:
+                generate_targets(generator, targets, args, handwritten)
+            
+    except (ChangelogError, TagDiscoveryError, ManifestFetchError) as e:
+        logger.error(f"Changelog generation failed: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        logger.info("Operation cancelled by user")
+        sys.exit(130)
+    except Exception as e:
+        logger.error(f"Unexpected error: {e}")
+        if args.verbose:
+            import traceback
+            traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if tracer.enabled:
+            write_profile(args.profile, args.github_output)
+